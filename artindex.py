@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+from collections import namedtuple
+from PIL import Image
+from rendercache import file_digest
+
+ART_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# One art file: id is its path relative to the art directory without the extension,
+# size its pixel dimensions and digest the sha256 shared with the render cache keys
+ArtEntry = namedtuple('ArtEntry', 'id path size digest mtime_ns bytes')
+
+
+def read_entry(art_id, path, stat):
+    # Only the image header is read for the dimensions; pixels are decoded at render time
+    with Image.open(path) as image:
+        size = image.size
+    return ArtEntry(art_id, path, size, file_digest(path), stat.st_mtime_ns, stat.st_size)
+
+
+class ArtIndex:
+    # Art directory scanned into memory so requests resolve art names with a dict lookup
+    # instead of touching the filesystem. A polling thread rescans every poll_interval
+    # seconds and only re-reads files whose mtime or size changed.
+    def __init__(self, directory, default=None, poll_interval=2.0):
+        self.directory = directory
+        self.default_path = default
+        self.poll_interval = poll_interval
+        self.default = None
+        self.scans = 0
+        self._entries = {}
+        self._by_path = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    def resolve(self, name):
+        # Accepts an id ("dragons/red") or a file name ("dragons/red.png"). Unknown names
+        # get the default art when there is one.
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self.default
+            if entry is None:
+                raise FileNotFoundError(f"Unknown art '{name}'")
+        return entry
+
+    def refresh(self):
+        # Rebuilds the index and swaps it in whole, so readers never see a partial scan
+        by_path = {}
+        for art_id, path, stat in self.scan():
+            entry = self._by_path.get(path)
+            if entry is None or (entry.mtime_ns, entry.bytes) != (stat.st_mtime_ns, stat.st_size):
+                try:
+                    entry = read_entry(art_id, path, stat)
+                except (OSError, Image.UnidentifiedImageError) as e:
+                    print(f"Skipping art {path}: {e}", file=sys.stderr)
+                    continue
+            by_path[path] = entry
+
+        entries = {}
+        for path in sorted(by_path):
+            entry = by_path[path]
+            entries.setdefault(entry.id, entry)
+            entries[os.path.relpath(path, self.directory).replace(os.sep, '/')] = entry
+
+        if self.default_path:
+            stat = os.stat(self.default_path)
+            default = self.default
+            if default is None or (default.mtime_ns, default.bytes) != (stat.st_mtime_ns, stat.st_size):
+                default = read_entry(None, self.default_path, stat)
+            self.default = default
+
+        changed = len(set(by_path.values()) ^ set(self._by_path.values()))
+        self._by_path = by_path
+        self._entries = entries
+        self.scans += 1
+        return changed
+
+    def scan(self):
+        # Yields (id, path, stat) for every art file below the directory
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        pending = [self.directory]
+        while pending:
+            with os.scandir(pending.pop()) as listing:
+                for entry in listing:
+                    if entry.is_dir():
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith(ART_EXTENSIONS) and entry.is_file():
+                        art_id = os.path.splitext(os.path.relpath(entry.path, self.directory))[0].replace(os.sep, '/')
+                        yield art_id, entry.path, entry.stat()
+
+    def start(self):
+        if self._thread is None and self.poll_interval:
+            self._thread = threading.Thread(target=self._poll, name="art-index", daemon=True)
+            self._thread.start()
+        return self
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except OSError as e:
+                print(f"Art index refresh failed: {e}", file=sys.stderr)
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def paths(self):
+        return sorted(self._by_path)
+
+    def stats(self):
+        return {
+            'art': len(self._by_path),
+            'names': len(self._entries),
+            'default': self.default.path if self.default else None,
+            'scans': self.scans
+        }
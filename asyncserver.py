@@ -0,0 +1,336 @@
+import io
+import json
+import time
+import random
+import signal
+import asyncio
+import argparse
+import http.client
+from http import HTTPStatus
+from urllib.parse import urlparse, parse_qs
+from cardcreatorLib import ENCODE_PROFILES
+from server import CardRequest, RenderService, ServerBusy, logger, route_label, add_service_arguments, start_service
+
+# Longest request line or header line, and most header lines, before a request is refused
+MAX_LINE = 64 * 1024
+MAX_HEADERS = 100
+
+
+class RequestError(Exception):
+    # Answered with its status; close drops the connection afterwards because the rest of
+    # the request was not read
+    def __init__(self, status, message, close=False):
+        super().__init__(message)
+        self.status = status
+        self.close = close
+
+
+class AsyncRequest(CardRequest):
+    def __init__(self, server, method, target, headers, body):
+        self.server = server
+        self.method = method
+        self.path = target
+        self.headers = headers
+        self.body = body
+
+
+class AsyncCardServer(RenderService):
+    # asyncio front end for the same POST / contract as server.py. A connection costs a
+    # coroutine instead of an I/O thread, so slow clients reading or writing do not hold
+    # anything else up. Renders always go to the process pool; the event loop only parses,
+    # waits and writes.
+    def __init__(self, workers=1, max_connections=1024, max_body=1024 * 1024, request_timeout=30, read_timeout=30, **options):
+        super().__init__(workers=max(workers, 1), **options)
+        self.max_connections = max_connections
+        self.max_body = max_body
+        self.request_timeout = request_timeout
+        self.read_timeout = read_timeout
+        self.connections = 0
+        self.cancelled = self.metrics.counter("card_cancelled_renders_total", "Renders cancelled, by reason", ("reason",))
+
+    async def handle_connection(self, reader, writer):
+        if self.connections >= self.max_connections:
+            await self.write_response(writer, 503, b"Server busy, retry shortly\n", [('Retry-After', '1')], close=True)
+            self.close_connection(writer)
+            return
+        self.connections += 1
+        pending = b""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader, pending), self.read_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except RequestError as e:
+                    await self.write_response(writer, e.status, f"{e}\n".encode('utf-8'), close=True)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                keep_alive, pending = await self.handle_request(request, reader, writer)
+                if not keep_alive:
+                    break
+        finally:
+            self.connections -= 1
+            self.close_connection(writer)
+
+    def close_connection(self, writer):
+        # Half-closes before closing so the client sees EOF even if another process
+        # still holds a copy of the socket
+        if writer.can_write_eof():
+            try:
+                writer.write_eof()
+            except OSError:
+                pass
+        writer.close()
+
+    async def read_line(self, reader, status, message):
+        # readline() raises ValueError for a line longer than the stream's MAX_LINE limit
+        try:
+            return await reader.readline()
+        except ValueError:
+            raise RequestError(status, message, close=True)
+
+    async def read_request(self, reader, pending=b""):
+        # Parses one request; returns None when the client closed an idle connection
+        line = pending + await self.read_line(reader, 414, "Request line too long")
+        while line in (b"\r\n", b"\n"):
+            line = await self.read_line(reader, 414, "Request line too long")
+        if not line:
+            return None
+        if len(line) > MAX_LINE or not line.endswith(b"\n"):
+            raise RequestError(414, "Request line too long", close=True)
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise RequestError(400, "Malformed request line", close=True)
+
+        lines = []
+        while True:
+            header = await self.read_line(reader, 431, "Request headers too large")
+            if header in (b"\r\n", b"\n", b""):
+                break
+            lines.append(header)
+            if len(lines) > MAX_HEADERS or not header.endswith(b"\n"):
+                raise RequestError(431, "Request headers too large", close=True)
+        headers = http.client.parse_headers(io.BytesIO(b"".join(lines) + b"\r\n"))
+        headers.version = version
+
+        body = b""
+        if method == 'POST':
+            if 'Transfer-Encoding' in headers:
+                raise RequestError(411, "Send the body with a Content-Length", close=True)
+            try:
+                length = int(headers.get('Content-Length', ''))
+            except ValueError:
+                raise RequestError(411, "Content-Length required", close=True)
+            if length > self.max_body:
+                raise RequestError(413, f"Body larger than {self.max_body} bytes", close=True)
+            body = await reader.readexactly(length)
+        return AsyncRequest(self, method, target, headers, body)
+
+    def keep_alive(self, request):
+        connection = request.headers.get('Connection', '').lower()
+        if request.headers.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    async def handle_request(self, request, reader, writer):
+        # Returns (keep the connection open, bytes of the next request already read)
+        start = time.perf_counter()
+        request.stage_timings = {}
+        keep_alive = self.keep_alive(request)
+        path = urlparse(request.path).path
+        try:
+            if request.method == 'POST' and path == '/':
+                status, body, headers, pending = await self.render_request(request, reader)
+            elif request.method == 'POST' and path == '/fit':
+                status, body, headers, pending = await self.fit_request(request)
+            elif request.method == 'GET' and path in ('/metrics', '/stats'):
+                status, pending = 200, b""
+                if path == '/metrics':
+                    body, headers = self.metrics.exposition().encode('utf-8'), [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')]
+                else:
+                    body, headers = json.dumps(self.stats()).encode('utf-8'), [('Content-Type', 'application/json')]
+            else:
+                status, body, headers, pending = 404, b"Not found\n", [], b""
+        except RequestError as e:
+            status, body, headers, pending = e.status, f"{e}\n".encode('utf-8'), [], b""
+            keep_alive = keep_alive and not e.close
+        except Exception as e:
+            # A failed render or fit; bytes of a pipelined request may have been read
+            # meanwhile, so the connection is not reused
+            logger.warning("request failed", exc_info=True)
+            status, body, headers, pending = 500, f"Request failed: {type(e).__name__}: {e}\n".encode('utf-8'), [], b""
+            keep_alive = False
+
+        if status is None:
+            # The client went away while its card rendered; there is nobody to answer
+            keep_alive = False
+        else:
+            write_start = time.perf_counter()
+            await self.write_response(writer, status, body, headers, close=not keep_alive, request=request)
+            self.observe_stage(request, 'write', time.perf_counter() - write_start)
+
+        seconds = time.perf_counter() - start
+        self.request_seconds.observe(seconds, path=route_label(path))
+        self.requests_total.inc(path=route_label(path), status=str(status or 499))
+        if random.random() < self.log_sample:
+            logger.info("request", extra={'fields': {
+                "path": path,
+                "status": status or 499,
+                "seconds": round(seconds, 6),
+                "stages": {stage: round(value, 6) for stage, value in request.stage_timings.items()}
+            }})
+        return keep_alive, pending
+
+    async def render_request(self, request, reader):
+        # The POST / contract of server.py: same query parameters, ETags and responses
+        parse_start = time.perf_counter()
+        url = urlparse(request.path)
+        query_params = parse_qs(url.query)
+        try:
+            post_data = json.loads(request.body.decode('utf-8'))
+        except ValueError as e:
+            raise RequestError(400, f"Invalid JSON: {e}")
+        self.observe_stage(request, 'parse', time.perf_counter() - parse_start)
+
+        try:
+            profile, save_options = request.encode_profile(query_params)
+            scale = request.output_scale(query_params)
+        except ValueError as e:
+            raise RequestError(400, str(e))
+        try:
+            args = (*request.card_args(post_data), profile, save_options, scale)
+        except (KeyError, TypeError) as e:
+            raise RequestError(400, f"Invalid card: {e!r}")
+        except OSError as e:
+            raise RequestError(404, f"Missing asset: {e}")
+        media_type = ENCODE_PROFILES[profile]['media_type']
+        mode = request.response_mode(query_params, media_type)
+
+        key = self.render_key(*args)
+        etag = request.etag(key, mode, query_params)
+        if etag in request.if_none_match() or '*' in request.if_none_match():
+            return 304, b"", [('ETag', etag)], b""
+
+        try:
+            future = self.submit_render(*args, key=key)
+        except ServerBusy:
+            return 503, b"Server busy, retry shortly\n", [('Content-Type', 'text/plain'), ('Retry-After', '1')], b""
+
+        image_data, pending = await self.wait_for_render(future, reader)
+        if image_data is None:
+            return None, b"", [], b""
+        request.stage_timings.update(future.timings['stages'])
+
+        if mode == 'raw':
+            return 200, image_data, [('Content-Type', media_type), ('ETag', etag)], pending
+        # base64 of a large card takes long enough to stall other connections, so it runs off the loop
+        envelope_start = time.perf_counter()
+        body = await asyncio.get_running_loop().run_in_executor(None, request.json_envelope, image_data, query_params)
+        self.observe_stage(request, 'base64', time.perf_counter() - envelope_start)
+        return 200, body, [('Content-Type', 'image/png'), ('ETag', etag)], pending
+
+    async def fit_request(self, request):
+        # The POST /fit contract of server.py. Fitting is usually well under a millisecond,
+        # but a long description cold in the measurement tables is not, so it runs off the loop.
+        try:
+            post_data = json.loads(request.body.decode('utf-8'))
+            values = request.fit_values(post_data)
+        except ValueError as e:
+            raise RequestError(400, f"Invalid JSON: {e}")
+        except TypeError as e:
+            raise RequestError(400, f"Invalid card: {e!r}")
+
+        fit_start = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(None, self.fit, values)
+        self.observe_stage(request, 'fit', time.perf_counter() - fit_start)
+        return 200, json.dumps(result).encode('utf-8'), [('Content-Type', 'application/json')], b""
+
+    async def wait_for_render(self, future, reader):
+        # Waits for a render while watching the connection. Returns (image, bytes read
+        # meanwhile), or (None, b"") after cancelling the render because the client
+        # disconnected. Raises RequestError 504 when the render takes too long.
+        render = asyncio.wrap_future(future)
+        watch = asyncio.ensure_future(reader.read(1))
+        deadline = time.monotonic() + self.request_timeout
+        pending = b""
+        try:
+            while not render.done():
+                waiting = {render} if watch is None else {render, watch}
+                done, _ = await asyncio.wait(waiting, timeout=max(0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    render.cancel()
+                    self.cancelled.inc(reason='timeout')
+                    raise RequestError(504, f"Render took longer than {self.request_timeout}s", close=True)
+                if watch in done:
+                    if not watch.result():
+                        render.cancel()
+                        self.cancelled.inc(reason='disconnect')
+                        return None, b""
+                    # A pipelined request started arriving; keep its first byte for later
+                    pending = watch.result()
+                    watch = None
+        finally:
+            if watch is not None:
+                watch.cancel()
+                try:
+                    await watch
+                except asyncio.CancelledError:
+                    pass
+                else:
+                    pending = watch.result()
+        return render.result(), pending
+
+    def observe_stage(self, request, stage, seconds):
+        request.stage_timings[stage] = seconds
+        self.stage_seconds.observe(seconds, stage=stage)
+
+    async def write_response(self, writer, status, body, headers=(), close=False, request=None):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        if request is not None and self.debug_timing and request.headers.get('X-Debug-Timing', '') not in ('', '0'):
+            lines.append("Server-Timing: " + ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in request.stage_timings.items()))
+        if status != 304:
+            lines.append(f"Content-Length: {len(body)}")
+        if close:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        if body and status != 304:
+            writer.write(body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stopped.set)
+        async with server:
+            await stopped.wait()
+        # Render processes are joined off the loop so in-flight responses can still be written
+        await loop.run_in_executor(None, self.close_renders)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Card render server, asyncio front end")
+    add_service_arguments(parser)
+    parser.add_argument("--max-connections", type=int, default=1024, help="open connections before new ones get 503")
+    parser.add_argument("--max-body", type=int, default=1024 * 1024, help="largest request body in bytes (413 above it)")
+    parser.add_argument("--request-timeout", type=float, default=30, help="seconds a render may take before a 504")
+    parser.add_argument("--read-timeout", type=float, default=30, help="seconds to wait for a request on an open connection")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = AsyncCardServer(max_connections=args.max_connections, max_body=args.max_body, request_timeout=args.request_timeout,
+                             read_timeout=args.read_timeout, **start_service(args))
+    print(f"Starting asyncio server on port {args.port} with {max(args.workers, 1)} render workers...")
+    asyncio.run(server.serve(args.host, args.port))
+    print("Server stopped")
@@ -0,0 +1,183 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import zipfile
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from cardcreatorLib import Creator, CARD_FIELDS, FONT_A, FONT_B, TEMPLATE, DEFAULT_ART, font_cache, encode_card, cache_budgets, set_cache_budgets, load_layout, layout_path, ENCODE_PROFILES, OUTPUT_SCALES
+
+# Set once per worker process by init_worker
+worker_settings = {}
+
+# Stands in for an input line that is not a card record, so it fails on its own
+BadRecord = namedtuple('BadRecord', 'error')
+
+
+def read_records(path, format=None):
+    # Yields card records one at a time so the whole deck is never held in memory
+    format = format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        if format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield BadRecord(f"line {number}: {type(e).__name__}: {e}")
+                    continue
+                yield record if isinstance(record, dict) else BadRecord(f"line {number}: expected a JSON object, got {type(record).__name__}")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def init_worker(settings):
+    # Fonts and the template are loaded once per process and reused for every card
+    worker_settings.update(settings)
+    if settings.get('budgets'):
+        set_cache_budgets(*settings['budgets'])
+    font_cache.preload([settings['font_a'], settings['font_b']])
+    Creator(settings['font_a'], settings['font_b'], settings['template'], settings['art']).load_base_card(settings.get('scale', 1))
+
+
+def render_card(record):
+    settings = worker_settings
+    art = os.path.join(settings['art_dir'], record['art']) if record.get('art') else settings['art']
+    creator = Creator(settings['font_a'], settings['font_b'], settings['template'], art)
+    return creator.generate_card(*(record.get(field) or "" for field in CARD_FIELDS), scale=settings.get('scale', 1))
+
+
+def render_record(index, record):
+    # Returns (index, record, encoded bytes, error) so one bad record does not stop the batch
+    try:
+        return index, record, encode_card(render_card(record), worker_settings['profile']), None
+    except Exception as e:
+        return index, record, None, f"{type(e).__name__}: {e}"
+
+
+def render_stream(records, settings, workers=None, window=None, render=render_record):
+    # Renders records on a process pool and yields results as they finish. At most
+    # `window` cards are in flight, which keeps memory flat for any deck size. render
+    # runs in the workers and must be a module-level function like render_record.
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(settings,)) as pool:
+        pending = set()
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                # Reported like a failed render; the empty record keeps callers' record.get safe
+                yield index, {}, None, record.error if isinstance(record, BadRecord) else f"expected a record, got {type(record).__name__}"
+                continue
+            pending.add(pool.submit(render, index, record))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def card_filename(index, record, extension):
+    name = record.get('filename') or f"{index + 1:04d}_{re.sub(r'[^A-Za-z0-9]+', '_', record.get('name') or 'card').strip('_')}"
+    return name if name.lower().endswith(extension) else name + extension
+
+
+class DirectoryWriter:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, filename, data):
+        with open(os.path.join(self.path, filename), 'wb') as output:
+            output.write(data)
+
+    def close(self):
+        pass
+
+
+class ZipWriter:
+    def __init__(self, path):
+        # Encoded images are already compressed, so entries are stored as-is
+        self.archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+
+    def write(self, filename, data):
+        self.archive.writestr(filename, data)
+
+    def close(self):
+        self.archive.close()
+
+
+def add_deck_arguments(parser):
+    # Input and render options shared with imposition.py
+    parser.add_argument("input", help="CSV or JSONL file with name, type, details, rarity, description and optional art/filename columns ('-' for stdin)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default from the file extension)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="render processes")
+    parser.add_argument("--font-a", default=FONT_A)
+    parser.add_argument("--font-b", default=FONT_B)
+    parser.add_argument("--template", default=TEMPLATE)
+    parser.add_argument("--art", default=DEFAULT_ART, help="art used when a record has no art column")
+    parser.add_argument("--art-dir", default="art", help="directory record art paths are relative to")
+    parser.add_argument("--scale", type=float, default=1, choices=OUTPUT_SCALES, help="output size as a multiple of the template's canvas")
+    parser.add_argument("--layer-cache-bytes", type=int, help="memory per worker for decoded template and art layers (default sized for --scale)")
+    parser.add_argument("--base-card-cache-bytes", type=int, help="memory per worker for composited base cards (default sized for --scale)")
+    parser.add_argument("--progress", type=int, default=50, help="report progress every N cards")
+
+
+def deck_settings(args, **extra):
+    layer_bytes, base_card_bytes = cache_budgets(load_layout(layout_path(args.template)).canvas, args.scale)
+    return {
+        'font_a': args.font_a,
+        'font_b': args.font_b,
+        'template': args.template,
+        'art': args.art,
+        'art_dir': args.art_dir,
+        'scale': args.scale,
+        'budgets': (args.layer_cache_bytes or layer_bytes, args.base_card_cache_bytes or base_card_bytes),
+        **extra
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a deck of cards from CSV or JSONL")
+    add_deck_arguments(parser)
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--out", help="directory to write card images to")
+    output.add_argument("--zip", help="zip file to write card images to")
+    parser.add_argument("--profile", default="png", choices=list(ENCODE_PROFILES), help="output encoding")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    settings = deck_settings(args, profile=args.profile)
+    extension = "." + ENCODE_PROFILES[args.profile]['format'].lower().replace('jpeg', 'jpg')
+    writer = ZipWriter(args.zip) if args.zip else DirectoryWriter(args.out)
+
+    rendered = failed = 0
+    start = time.perf_counter()
+    try:
+        for index, record, data, error in render_stream(read_records(args.input, args.format), settings, workers=args.workers):
+            if error:
+                failed += 1
+                print(f"Card {index + 1} ({record.get('name')!r}) failed: {error}", file=sys.stderr)
+                continue
+            writer.write(card_filename(index, record, extension), data)
+            rendered += 1
+            if rendered % args.progress == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{rendered} cards in {elapsed:.1f}s ({rendered / elapsed:.1f} cards/s)", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {rendered} cards, {failed} failed, in {elapsed:.1f}s ({rendered / max(elapsed, 1e-9):.1f} cards/s)")
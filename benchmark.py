@@ -0,0 +1,523 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import http.client
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage; peak memory is then not reported
+    resource = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CARD = {
+    "name": "Giant's Ring of the Little Folk",
+    "type": "Item",
+    "details": "Requires Attunement",
+    "rarity": "Rare",
+    "description": "While wearing this ring you can cast enlarge/reduce on yourself at will, "
+                   "targeting only yourself. When you do, you may choose to grow one size larger "
+                   "or shrink one size smaller than you normally could.\n"
+                   "The ring has 3 charges and regains 1d3 expended charges daily at dawn.",
+    "art": "placeholder"
+}
+
+WORDS = ("the", "of", "and", "a", "to", "you", "your", "creature", "ring", "charge", "charges", "spell", "attack",
+         "damage", "target", "dawn", "expended", "regains", "while", "wearing", "bonus", "action", "saving", "throw",
+         "wisdom", "strength", "dexterity", "radiant", "necrotic", "thunderous", "feet", "within", "range", "until",
+         "the end of your next turn", "advantage", "disadvantage", "resistance", "immunity", "Constitution")
+NAME_WORDS = ("Ring", "Blade", "Cloak", "Staff", "Amulet", "Warden", "Ember", "Frost", "Whispering", "Sunforged",
+              "Leyfarer's", "Moonlit", "of", "the", "Hollow", "King", "Little", "Folk", "Giant's", "Everburning")
+
+# (workload, what it exercises, card fields generated from a seeded random.Random)
+WORKLOADS = (
+    ("short-name", "names that fit at the largest size", lambda rng: card(rng, name_words=2, description_chars=200)),
+    ("long-name", "names long enough that fitting has to shrink them", lambda rng: card(rng, name_words=8, description_chars=200)),
+    ("description-50", "50 character description", lambda rng: card(rng, description_chars=50)),
+    ("description-250", "250 character description with newlines", lambda rng: card(rng, description_chars=250)),
+    ("description-500", "500 character description with newlines", lambda rng: card(rng, description_chars=500)),
+    ("description-1000", "1,000 character description with newlines", lambda rng: card(rng, description_chars=1000)),
+    ("description-2000", "2,000 character description with newlines", lambda rng: card(rng, description_chars=2000)),
+    ("overflow-name", "name that overflows at the 12pt floor", lambda rng: card(rng, name_words=30, description_chars=200)),
+    ("overflow-description", "description that overflows at the 12pt floor", lambda rng: card(rng, description_chars=4000)),
+)
+
+
+def server_sandbox():
+    # The server resolves assets/ and art/ relative to its working directory
+    sandbox = tempfile.mkdtemp(prefix="cardbench-")
+    os.symlink(os.path.join(ROOT, "assets"), os.path.join(sandbox, "assets"))
+    os.mkdir(os.path.join(sandbox, "art"))
+    shutil.copy(os.path.join(ROOT, "assets", "Leyfarer_card_item_Placeholder_Art_v1.png"), os.path.join(sandbox, "art"))
+    return sandbox
+
+
+def start_server(port, server_args, cwd, script="server.py"):
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, script), "--port", str(port), *server_args],
+                               cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.connect()
+            connection.close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def post_cards(port, path, body, duration):
+    # One keep-alive client posting back to back; returns (completed, rejected)
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    completed = rejected = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        connection.request("POST", path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status == 200:
+            completed += 1
+        else:
+            rejected += 1
+    connection.close()
+    return completed, rejected
+
+
+def run_clients(port, clients, duration, path="/", card=CARD):
+    body = json.dumps(card).encode("utf-8")
+    # Clients run in their own processes so they do not compete with each other for the GIL
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(post_cards, [port] * clients, [path] * clients, [body] * clients, [duration] * clients))
+    return sum(result[0] for result in results), sum(result[1] for result in results)
+
+
+def bench_server(args):
+    worker_counts = args.workers or [1, 2, 4, os.cpu_count() or 1]
+    worker_counts = sorted(set(count for count in worker_counts if count > 0))
+    sandbox = server_sandbox()
+    rows = []
+    try:
+        for workers in worker_counts:
+            if args.front_end == "asyncio":
+                process = start_server(args.port, ["--workers", str(workers)], sandbox, "asyncserver.py")
+            else:
+                process = start_server(args.port, ["--workers", str(workers), "--threads", str(max(args.clients, 4))], sandbox)
+            try:
+                run_clients(args.port, args.clients, 1)  # warm up render processes
+                completed, rejected = run_clients(args.port, args.clients, args.duration)
+            finally:
+                stop_server(process)
+            rows.append({"workers": workers, "clients": args.clients, "requests": completed,
+                         "rejected": rejected, "rps": completed / args.duration})
+    finally:
+        shutil.rmtree(sandbox)
+
+    print(f"{'workers':>8} {'clients':>8} {'requests':>9} {'503s':>6} {'req/s':>8}")
+    for row in rows:
+        print(f"{row['workers']:>8} {row['clients']:>8} {row['requests']:>9} {row['rejected']:>6} {row['rps']:>8.1f}")
+    return rows
+
+
+def card(rng, name_words=3, description_chars=300):
+    # A card with text from the word lists. Descriptions break into paragraphs with
+    # explicit newlines every few sentences, as real card text does.
+    name = " ".join(rng.choice(NAME_WORDS) for _ in range(name_words))
+    words = []
+    length = 0
+    while length < description_chars:
+        word = rng.choice(WORDS)
+        if words and rng.random() < 0.08:
+            word = ".\n" + word.capitalize() if rng.random() < 0.3 else ". " + word.capitalize()
+            words[-1] += word
+        else:
+            words.append(word)
+        length += len(word) + 1
+    description = " ".join(words)[:description_chars].rstrip() + "."
+    return {"name": name, "type": rng.choice(("Item", "Weapon", "Armor", "Wondrous")), "details": rng.choice(("Requires Attunement", "Charges: 3", "")),
+            "rarity": rng.choice(("Common", "Uncommon", "Rare", "Very Rare", "Legendary")), "description": description}
+
+
+def sample_creator():
+    from cardcreatorLib import Creator
+    assets = os.path.join(ROOT, "assets")
+    return Creator(os.path.join(assets, "FontA_Cinzel-Bold.otf"), os.path.join(assets, "FontB_CrimsonPro-VariableFont_wght.ttf"),
+                   os.path.join(assets, "Leyfarer_card_item_Template_v1.png"), os.path.join(assets, "Leyfarer_card_item_Placeholder_Art_v1.png"))
+
+
+def percentile(timings, fraction):
+    # Nearest-rank percentile of an already sorted list
+    return timings[min(len(timings) - 1, max(0, round(fraction * len(timings)) - 1))]
+
+
+def peak_rss_mb(who=None):
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS; for children it is the largest one
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def bench_render(args):
+    # Latency of Creator.render on warm caches, as a long-running server sees it, plus the
+    # text measurements fitting took and the time to encode the result. Text layers are
+    # cleared before every timed render so repeats fit and draw again; re-rendering the
+    # same card from its cached text layers is reported separately.
+    from cardcreatorLib import encode_card, text_layer_cache
+    rng = random.Random(args.seed)
+    selected = [workload for workload in WORKLOADS if not args.workloads or workload[0] in args.workloads]
+    cards = {name: [make_card(rng) for _ in range(args.cards)] for name, _, make_card in selected}
+
+    sample_creator().generate_card(**{key: value for key, value in CARD.items() if key != "art"})  # load fonts and layers
+    rows = []
+    for name, description, _ in selected:
+        renders = []
+        cached = []
+        encodes = []
+        measure_calls = []
+        description_calls = []
+        font_sizes = []
+        overflows = 0
+        for fields in cards[name]:
+            for repeat in range(args.repeat):
+                creator = sample_creator()
+                text_layer_cache.clear()
+                start = time.perf_counter()
+                rendered, diagnostics = creator.render(fields["name"], fields["type"], fields["details"], fields["rarity"], fields["description"])
+                renders.append(time.perf_counter() - start)
+                if repeat == 0:
+                    measure_calls.append(creator.measure_count)
+                    description_calls.append(diagnostics["Description"]["measure_calls"])
+                    font_sizes.append(min(field["font_size"] for field in diagnostics.values() if field["font_size"]))
+                    overflows += any(field["overflow"] for field in diagnostics.values())
+                    if args.encode:
+                        start = time.perf_counter()
+                        encode_card(rendered, args.profile)
+                        encodes.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            sample_creator().render(fields["name"], fields["type"], fields["details"], fields["rarity"], fields["description"])
+            cached.append(time.perf_counter() - start)
+        renders.sort()
+        rows.append({
+            "workload": name,
+            "description": description,
+            "cards": len(cards[name]),
+            "renders": len(renders),
+            "p50_ms": percentile(renders, 0.5) * 1000,
+            "p90_ms": percentile(renders, 0.9) * 1000,
+            "p99_ms": percentile(renders, 0.99) * 1000,
+            "max_ms": renders[-1] * 1000,
+            "measure_calls": sum(measure_calls) / len(measure_calls),
+            "description_measure_calls": sum(description_calls) / len(description_calls),
+            "min_font_size": min(font_sizes),
+            "overflows": overflows,
+            "cached_p50_ms": percentile(sorted(cached), 0.5) * 1000,
+            "encode_p50_ms": percentile(sorted(encodes), 0.5) * 1000 if encodes else None,
+            "peak_rss_mb": peak_rss_mb()
+        })
+
+    print(f"{'workload':<22} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'cached ms':>10} {'measures':>9} {'min pt':>7} {'overflow':>9} {'encode ms':>10}")
+    for row in rows:
+        encode = f"{row['encode_p50_ms']:>10.1f}" if row['encode_p50_ms'] is not None else f"{'-':>10}"
+        print(f"{row['workload']:<22} {row['p50_ms']:>8.2f} {row['p90_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['cached_p50_ms']:>10.2f} "
+              f"{row['measure_calls']:>9.1f} {row['min_font_size']:>7} {row['overflows']:>9} {encode}")
+    return rows
+
+
+def bench_fit(args):
+    # Creator.layout replayed as a web editor calls it: once per keystroke while each
+    # card's description is typed in, with the other fields unchanged
+    rng = random.Random(args.seed)
+    selected = [workload for workload in WORKLOADS if not args.workloads or workload[0] in args.workloads]
+    sample_creator().layout(**{key: value for key, value in CARD.items() if key != "art"})  # load fonts
+    rows = []
+    for name, description, make_card in selected:
+        checks = []
+        measure_calls = 0
+        for fields in (make_card(rng) for _ in range(args.cards)):
+            creator = sample_creator()
+            text = fields["description"]
+            for end in range(1, len(text) + 1):
+                start = time.perf_counter()
+                creator.layout(fields["name"], fields["type"], fields["details"], fields["rarity"], text[:end])
+                checks.append(time.perf_counter() - start)
+            measure_calls += creator.measure_count
+        elapsed = sum(checks)
+        checks.sort()
+        rows.append({
+            "workload": name,
+            "description": description,
+            "checks": len(checks),
+            "checks_per_second": len(checks) / elapsed,
+            "p50_us": percentile(checks, 0.5) * 1e6,
+            "p99_us": percentile(checks, 0.99) * 1e6,
+            "max_us": checks[-1] * 1e6,
+            "measure_calls": measure_calls / len(checks)
+        })
+
+    print(f"{'workload':<22} {'checks/s':>9} {'p50 us':>8} {'p99 us':>8} {'max us':>9} {'measures':>9}")
+    for row in rows:
+        print(f"{row['workload']:<22} {row['checks_per_second']:>9.0f} {row['p50_us']:>8.0f} {row['p99_us']:>8.0f} "
+              f"{row['max_us']:>9.0f} {row['measure_calls']:>9.2f}")
+    return rows
+
+
+def measure_scale(scale, cards, seed, profile):
+    # Runs in a fresh process per scale, so caches start empty and peak RSS is this scale's
+    from cardcreatorLib import encode_card, layer_cache, base_card_cache, text_layer_cache
+    rng = random.Random(seed)
+    fields = [card(rng, description_chars=rng.choice((100, 400, 900))) for _ in range(cards)]
+    start = time.perf_counter()
+    rendered = sample_creator().generate_card(**{key: value for key, value in CARD.items() if key != "art"}, scale=scale)
+    cold = time.perf_counter() - start
+    renders = []
+    for values in fields:
+        start = time.perf_counter()
+        rendered = sample_creator().generate_card(**values, scale=scale)
+        renders.append(time.perf_counter() - start)
+    renders.sort()
+    start = time.perf_counter()
+    data = encode_card(rendered, profile)
+    encode = time.perf_counter() - start
+    return {
+        "scale": scale,
+        "size": list(rendered.size),
+        "cold_ms": cold * 1000,
+        "p50_ms": percentile(renders, 0.5) * 1000,
+        "p99_ms": percentile(renders, 0.99) * 1000,
+        "encode_ms": encode * 1000,
+        "encoded_kb": len(data) / 1024,
+        "layer_cache_mb": layer_cache.stats()["bytes"] / (1024 * 1024),
+        "base_card_cache_mb": base_card_cache.stats()["bytes"] / (1024 * 1024),
+        "text_layer_cache_mb": text_layer_cache.stats()["bytes"] / (1024 * 1024),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def bench_scales(args):
+    # Render latency and memory at each output scale: the first card builds the layer
+    # pyramid and the scaled layers, later cards with new text reuse them
+    rows = []
+    for scale in args.scales:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            rows.append(pool.submit(measure_scale, scale, args.cards, args.seed, args.profile).result())
+
+    print(f"{'scale':>5} {'size':>11} {'cold ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'encode ms':>10} {'KiB':>8} "
+          f"{'layers MiB':>11} {'bases MiB':>10} {'text MiB':>9} {'RSS MiB':>8}")
+    for row in rows:
+        size = f"{row['size'][0]}x{row['size'][1]}"
+        rss = f"{row['peak_rss_mb']:>8.0f}" if row['peak_rss_mb'] is not None else f"{'-':>8}"
+        print(f"{row['scale']:>5} {size:>11} {row['cold_ms']:>8.1f} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['encode_ms']:>10.1f} "
+              f"{row['encoded_kb']:>8.0f} {row['layer_cache_mb']:>11.1f} {row['base_card_cache_mb']:>10.1f} {row['text_layer_cache_mb']:>9.1f} {rss}")
+    return rows
+
+
+def render_sample_card():
+    return sample_creator().generate_card(CARD["name"], CARD["type"], CARD["details"], CARD["rarity"], CARD["description"])
+
+
+def bench_encode(args):
+    from cardcreatorLib import encode_card, ENCODE_PROFILES
+    card = render_sample_card()
+    rows = []
+    for profile in args.profiles or list(ENCODE_PROFILES):
+        encode_card(card, profile)  # warm up codec state
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            data = encode_card(card, profile)
+            timings.append(time.perf_counter() - start)
+        rows.append({"profile": profile, "ms": sorted(timings)[len(timings) // 2] * 1000, "bytes": len(data)})
+
+    print(f"{'profile':<14} {'encode ms':>10} {'KiB':>9}")
+    for row in rows:
+        print(f"{row['profile']:<14} {row['ms']:>10.1f} {row['bytes'] / 1024:>9.1f}")
+    return rows
+
+
+def bench_impose(args):
+    # A generated deck rendered, imposed and written to a PDF in a temporary directory.
+    # Peak memory of this process should stay at about one sheet whatever the deck size.
+    from imposition import sheet_layout, write_deck_pdf
+    rng = random.Random(args.seed)
+    records = (card(rng, description_chars=rng.choice((100, 400, 900))) for _ in range(args.cards))
+    assets = os.path.join(ROOT, "assets")
+    settings = {
+        'font_a': os.path.join(assets, "FontA_Cinzel-Bold.otf"),
+        'font_b': os.path.join(assets, "FontB_CrimsonPro-VariableFont_wght.ttf"),
+        'template': os.path.join(assets, "Leyfarer_card_item_Template_v1.png"),
+        'art': os.path.join(assets, "Leyfarer_card_item_Placeholder_Art_v1.png"),
+        'art_dir': assets
+    }
+    sheet = sheet_layout(args.page)
+    output = tempfile.mkdtemp(prefix="cardbench-")
+    try:
+        path = os.path.join(output, "deck.pdf")
+        start = time.perf_counter()
+        cards, pages, failed = write_deck_pdf(records, path, sheet, settings, workers=args.workers, compression=args.compression)
+        elapsed = time.perf_counter() - start
+        row = {"cards": cards, "failed": failed, "pages": pages, "per_page": sheet.columns * sheet.rows, "seconds": elapsed,
+               "pages_per_second": pages / elapsed, "cards_per_second": cards / elapsed, "pdf_mb": os.path.getsize(path) / (1024 * 1024),
+               "peak_rss_mb": peak_rss_mb(), "worker_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None}
+    finally:
+        shutil.rmtree(output)
+
+    print(f"{row['cards']} cards on {row['pages']} {args.page} pages ({row['per_page']}-up) in {row['seconds']:.1f}s: "
+          f"{row['pages_per_second']:.2f} pages/s, {row['cards_per_second']:.1f} cards/s, {row['pdf_mb']:.1f} MiB PDF, "
+          f"peak RSS {row['peak_rss_mb']:.0f} MiB (largest worker {row['worker_peak_rss_mb']:.0f} MiB)")
+    return [row]
+
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, 'tkinter' in sys.modules, len(sys.modules))
+"""
+
+
+def bench_import(args):
+    # Cold start: every import runs in a fresh interpreter
+    rows = []
+    for module in args.modules:
+        timings = []
+        for _ in range(args.repeat):
+            output = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module)], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.split()
+            timings.append(float(output[0]))
+        rows.append({"module": module, "ms": sorted(timings)[len(timings) // 2] * 1000,
+                     "tkinter": output[1] == "True", "modules": int(output[2])})
+
+    print(f"{'module':<16} {'import ms':>10} {'tkinter':>8} {'modules':>8}")
+    for row in rows:
+        print(f"{row['module']:<16} {row['ms']:>10.1f} {str(row['tkinter']):>8} {row['modules']:>8}")
+    return rows
+
+
+def bench_suite(args):
+    # Every benchmark with its defaults, for comparing whole runs
+    results = {}
+    for command in ("render", "fit", "scales", "encode", "import", "impose", "server"):
+        print(f"\n== {command}")
+        results[command] = COMMANDS[command](argparse.Namespace(**SUITE_DEFAULTS[command], seed=args.seed, port=args.port))
+    return results
+
+
+def environment():
+    from PIL import __version__ as pillow_version
+    return {
+        "python": platform.python_version(),
+        "pillow": pillow_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def write_results(path, args, results):
+    # Machine-readable record of a run: what ran, where, and the rows printed above
+    settings = {key: value for key, value in vars(args).items() if key not in ("run", "json")}
+    report = {"benchmark": args.command, "time": time.time(), "environment": environment(), "settings": settings, "results": results}
+    if path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(path, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Card renderer benchmarks")
+    parser.add_argument("--json", help="also write the results as JSON to this file ('-' for stdout)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render = commands.add_parser("render", help="Creator.render latency, text measurements and encode time per workload")
+    render.add_argument("--workloads", nargs="*", choices=[workload[0] for workload in WORKLOADS], help="workloads to run (default all)")
+    render.add_argument("--cards", type=int, default=20, help="generated cards per workload")
+    render.add_argument("--repeat", type=int, default=5, help="renders of each card")
+    render.add_argument("--seed", type=int, default=1, help="seed for the generated cards, so runs are comparable")
+    render.add_argument("--profile", default="png", help="profile for the encode timings")
+    render.add_argument("--no-encode", dest="encode", action="store_false", help="skip the encode timings")
+    render.set_defaults(run=bench_render)
+
+    fit = commands.add_parser("fit", help="Creator.layout fit checks per second, one per keystroke of each description")
+    fit.add_argument("--workloads", nargs="*", choices=[workload[0] for workload in WORKLOADS], help="workloads to run (default all)")
+    fit.add_argument("--cards", type=int, default=5, help="generated cards per workload")
+    fit.add_argument("--seed", type=int, default=1, help="seed for the generated cards, so runs are comparable")
+    fit.set_defaults(run=bench_fit)
+
+    scales = commands.add_parser("scales", help="render latency, encode time and memory at each output scale")
+    scales.add_argument("--scales", type=float, nargs="*", default=[0.5, 1, 2, 4], help="output scales to measure")
+    scales.add_argument("--cards", type=int, default=20, help="generated cards rendered at each scale")
+    scales.add_argument("--seed", type=int, default=1, help="seed for the generated cards, so runs are comparable")
+    scales.add_argument("--profile", default="png", help="profile for the encode timing")
+    scales.set_defaults(run=bench_scales)
+
+    server = commands.add_parser("server", help="requests/sec of server.py as render workers are added")
+    server.add_argument("--workers", type=int, nargs="*", help="render worker counts to try (default 1 2 4 ncpu)")
+    server.add_argument("--clients", type=int, default=8, help="concurrent keep-alive clients")
+    server.add_argument("--duration", type=float, default=10, help="seconds per run")
+    server.add_argument("--port", type=int, default=8765)
+    server.add_argument("--front-end", choices=["threaded", "asyncio"], default="threaded", help="server.py or asyncserver.py")
+    server.set_defaults(run=bench_server)
+
+    encode = commands.add_parser("encode", help="encode time and size of each output profile on the bundled template")
+    encode.add_argument("--profiles", nargs="*", help="profiles to measure (default all)")
+    encode.add_argument("--repeat", type=int, default=5, help="encodes per profile; the median is reported")
+    encode.set_defaults(run=bench_encode)
+
+    imports = commands.add_parser("import", help="cold-start import time of the render core")
+    imports.add_argument("--modules", nargs="*", default=["cardcreatorLib"], help="modules to import")
+    imports.add_argument("--repeat", type=int, default=10, help="fresh interpreters per module; the median is reported")
+    imports.set_defaults(run=bench_import)
+
+    impose = commands.add_parser("impose", help="pages/sec of rendering a deck onto print sheets in a PDF")
+    impose.add_argument("--cards", type=int, default=500, help="cards in the generated deck")
+    impose.add_argument("--page", default="letter", choices=["letter", "a4"])
+    impose.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="render processes")
+    impose.add_argument("--compression", default="jpeg", choices=["jpeg", "flate"])
+    impose.add_argument("--seed", type=int, default=1)
+    impose.set_defaults(run=bench_impose)
+
+    suite = commands.add_parser("suite", help="render, fit, scales, encode, import, impose and server benchmarks with their defaults")
+    suite.add_argument("--seed", type=int, default=1)
+    suite.add_argument("--port", type=int, default=8765)
+    suite.set_defaults(run=bench_suite)
+
+    return parser.parse_args()
+
+
+COMMANDS = {"render": bench_render, "fit": bench_fit, "scales": bench_scales, "encode": bench_encode, "import": bench_import, "impose": bench_impose, "server": bench_server}
+SUITE_DEFAULTS = {
+    "render": {"workloads": None, "cards": 20, "repeat": 5, "profile": "png", "encode": True},
+    "fit": {"workloads": None, "cards": 5},
+    "scales": {"scales": [0.5, 1, 2, 4], "cards": 20, "profile": "png"},
+    "encode": {"profiles": None, "repeat": 5},
+    "import": {"modules": ["cardcreatorLib"], "repeat": 10},
+    "impose": {"cards": 500, "page": "letter", "workers": os.cpu_count() or 1, "compression": "jpeg"},
+    "server": {"workers": None, "clients": 8, "duration": 10, "front_end": "threaded"}
+}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = args.run(args)
+    if args.json:
+        write_results(args.json, args, results)
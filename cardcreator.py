@@ -1,10 +1,52 @@
 import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter.ttk import Combobox, Label
-from PIL import Image, ImageDraw, ImageFont, ImageTk
+from PIL import ImageTk
 import webbrowser
 import traceback
+from cardcreatorLib import Creator
+
+# Wait this long after the last edit before rendering the live preview
+PREVIEW_DELAY_MS = 250
+# Previews render straight at 300x420 instead of shrinking a full 750x1050 card
+PREVIEW_SCALE = 0.4
+
+
+class PreviewWorker:
+    # Runs render(job) on a background thread. Only the newest job is kept: older jobs
+    # are dropped before they start and their results discarded if they finish late.
+    def __init__(self, render):
+        self.render = render
+        self.results = queue.Queue()
+        self._condition = threading.Condition()
+        self._job = None
+        self._generation = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, job):
+        with self._condition:
+            self._generation += 1
+            self._job = (self._generation, job)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._job is None:
+                    self._condition.wait()
+                generation, job = self._job
+                self._job = None
+            try:
+                result = self.render(job)
+            except Exception as e:
+                result = e
+            with self._condition:
+                if generation == self._generation:
+                    self.results.put(result)
+
 
 class CardCreatorApp:
     def __init__(self, root):
@@ -23,6 +65,11 @@ class CardCreatorApp:
         # Create UI Elements
         self.create_widgets()
 
+        # Live preview: edits are debounced and rendered off the UI thread
+        self.preview_after_id = None
+        self.preview_worker = PreviewWorker(self.render_live_preview)
+        self.poll_live_preview()
+
     def create_widgets(self):
         outer_frame = tk.Frame(self.root, padx=10, pady=10)
         outer_frame.pack(expand=True, fill='both')
@@ -74,13 +121,13 @@ class CardCreatorApp:
             if values:
                 combobox = Combobox(parent, values=values, state="readonly")
                 combobox.grid(row=row, column=1, padx=5, pady=5, sticky='w')
+                combobox.bind("<<ComboboxSelected>>", self.schedule_live_preview)
                 setattr(self, widget_name, combobox)
             else:
                 widget = tk.Text(parent, width=30, height=5, wrap="word") if widget_name == 'description_text' else tk.Entry(parent, width=30)
                 widget.grid(row=row, column=1, padx=5, pady=5, sticky='w')
+                widget.bind("<KeyRelease>", self.schedule_live_preview)
                 setattr(self, widget_name, widget)
-                if widget_name == 'description_text':
-                    widget.bind("<KeyRelease>", self.check_description_length)
 
     def create_action_buttons(self, parent):
         buttons = [
@@ -104,6 +151,7 @@ class CardCreatorApp:
             self.paths[layer_type] = file_path
             getattr(self, f"{layer_type}_label").config(text=os.path.basename(file_path) + " ✓")
             self.update_buttons_state()
+            self.schedule_live_preview()
 
     def update_buttons_state(self):
         all_resources_loaded = all(self.paths[resource] for resource in ('background_image', 'font_a', 'font_b'))
@@ -126,9 +174,8 @@ class CardCreatorApp:
     def preview_card(self):
         if not self.validate_fields():
             return
-        card = self.generate_card()
+        card = self.generate_card(scale=PREVIEW_SCALE)
         if card:
-            card.thumbnail((300, 420))
             card_image = ImageTk.PhotoImage(card)
             self.preview_panel.config(image=card_image)
             self.preview_panel.image = card_image
@@ -143,169 +190,69 @@ class CardCreatorApp:
                 card.save(save_path)
                 messagebox.showinfo("Card Created", f"Card saved as {save_path}")
 
-    def generate_card(self):
+    def card_fields(self):
+        return (self.name_entry.get(), self.type_combobox.get(), self.details_entry.get(),
+                self.rarity_combobox.get(), self.description_text.get("1.0", "end-1c"))
+
+    def creator(self, paths=None):
+        paths = paths or self.paths
+        return Creator(paths['font_a'], paths['font_b'], paths['background_image'], paths['card_art'])
+
+    def generate_card(self, scale=1):
         try:
-            background_image = Image.open(self.paths['background_image'])
-            card_art_image = Image.open(self.paths['card_art']) if self.paths['card_art'] else None
+            card, diagnostics = self.creator().render(*self.card_fields(), scale=scale)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load images: {str(e)}")
             return None
 
-        card = Image.new("RGBA", (750, 1050))
-        if card_art_image:
-            card.paste(card_art_image, (0, 0))
-        card.paste(background_image, (0, 0), background_image)
-        draw = ImageDraw.Draw(card)
-
-        # Load fonts
-        font_a = self.load_font(self.paths['font_a'], 40)
-        font_b = self.load_font(self.paths['font_b'], 40)
-
-        # Draw text fields
-        text_entries = [
-            ("Name", self.name_entry.get(), font_a, (43, 52, 707, 108), 40, None, True, True),  # Moved Name 3 pixels lower from previous position
-            ("Type", self.type_combobox.get(), font_a, (51, 561, 188, 617), 22, 22, False, False),  # Moved Type up by 3 pixels, fixed size 22
-            ("Details", self.details_entry.get(), font_a, (235, 561, 515, 617), 25, None, True, False),  # Moved Details up by 3 pixels, max size 25
-            ("Rarity", self.rarity_combobox.get(), font_a, (561, 561, 698, 617), 22, 22, False, False),  # Moved Rarity up by 3 pixels, fixed size 22
-            ("Description", self.description_text.get("1.0", "end-1c"), font_b, (49, 644, 701, 968), 40, None, True, True)
-        ]
-        for field_name, text, font, box, max_font_size, fixed_font_size, adjust_font, left_justified in text_entries:
-            self.draw_text(draw, field_name, text, font, box, max_font_size=max_font_size, fixed_font_size=fixed_font_size, adjust_font_size=adjust_font, left_justified=left_justified)
-
+        # Set background warning if the description does not fit even at the smallest size
+        if diagnostics['Description']['overflow']:
+            self.description_text.config(bg='#ffdddd')  # Light red background for warning
+            self.show_warning_tooltip("Warning: Too much text. Please shorten the description.")
+        else:
+            self.description_text.config(bg='white')  # Reset background if size is acceptable
         return card
 
-    def load_font(self, font_path, size):
-        try:
-            return ImageFont.truetype(font_path, size)
-        except Exception as e:
-            print(f"Failed to load font: {e}")
-            return ImageFont.load_default()
+    def schedule_live_preview(self, event=None):
+        # Coalesce keystrokes: every edit restarts the timer
+        if self.preview_after_id:
+            self.root.after_cancel(self.preview_after_id)
+        self.preview_after_id = self.root.after(PREVIEW_DELAY_MS, self.start_live_preview)
 
-    def draw_text(self, draw, field_name, text, font, box, max_font_size=None, fixed_font_size=None, adjust_font_size=False, left_justified=False):
-        if not text:
+    def start_live_preview(self):
+        self.preview_after_id = None
+        if not self.paths['font_b']:
             return
+        # Snapshot the inputs here; the worker thread must not touch Tk widgets
+        self.preview_worker.submit((dict(self.paths), self.card_fields()))
 
-        max_font_size = max_font_size or font.size
-        adjusted_font = font
+    def render_live_preview(self, job):
+        # Runs on the worker thread. Renders a preview when everything is loaded,
+        # otherwise only lays out the fields to check the description for overflow.
+        paths, fields = job
+        creator = self.creator(paths)
+        if all(paths[resource] for resource in ('background_image', 'font_a', 'font_b')):
+            card, diagnostics = creator.render(*fields, scale=PREVIEW_SCALE)
+            return card, diagnostics['Description']['overflow']
 
-        # Use fixed font size if provided
-        if fixed_font_size:
-            adjusted_font = ImageFont.truetype(font.path, fixed_font_size)
-        else:
-            # Adjust font size to fit the box horizontally or vertically as needed
-            if field_name in ["Name", "Details"]:
-                max_width = box[2] - box[0]
-                while adjusted_font.size > 12 and draw.textbbox((0, 0), text, font=adjusted_font)[2] > max_width:
-                    adjusted_font = ImageFont.truetype(adjusted_font.path, adjusted_font.size - 1)
-            elif field_name == "Description":
-                max_height = box[3] - box[1]
-                wrapped_text = self.wrap_text(draw, text, adjusted_font, box[2] - box[0], respect_formatting=True)
-                total_height = sum(draw.textbbox((0, 0), line, font=adjusted_font)[3] for line in wrapped_text.splitlines())
-                while adjusted_font.size > 12 and total_height > max_height:
-                    adjusted_font = ImageFont.truetype(adjusted_font.path, adjusted_font.size - 1)
-                    wrapped_text = self.wrap_text(draw, text, adjusted_font, box[2] - box[0], respect_formatting=True)
-                    total_height = sum(draw.textbbox((0, 0), line, font=adjusted_font)[3] for line in wrapped_text.splitlines())
-
-        # Set adjusted font for text drawing
-        font = adjusted_font
-
-        if font.size <= 12:
-            self.show_warning(field_name)
-
-        if field_name == "Description":
-            self.draw_wrapped_text(draw, box, text, font, respect_formatting=True)
-        else:
-            self.draw_centered_text(draw, box, text, font)
-
-    def draw_centered_text(self, draw, box, text, font):
-        box_x0, box_y0, box_x1, box_y1 = box
-        text_width, text_height = draw.textbbox((0, 0), text, font=font)[2:]
-        x = box_x0 + (box_x1 - box_x0 - text_width) / 2
-        y = box_y0 + (box_y1 - box_y0 - text_height) / 2
-        draw.text((x, y), text, font=font, fill="black")
-
-    def draw_wrapped_text(self, draw, box, text, font, respect_formatting=False):
-        box_x0, box_y0, box_x1, box_y1 = box
-        max_width = box_x1 - box_x0
-        max_height = box_y1 - box_y0
-
-        # Adjust font size until text fits within the bounding box
-        wrapped_text = self.wrap_text(draw, text, font, max_width, respect_formatting=respect_formatting)
-        total_height = sum(draw.textbbox((0, 0), line, font=font)[3] for line in wrapped_text.splitlines())
-
-        while font.size > 12 and total_height > max_height:
-            font = ImageFont.truetype(font.path, font.size - 1)
-            wrapped_text = self.wrap_text(draw, text, font, max_width, respect_formatting=respect_formatting)
-            total_height = sum(draw.textbbox((0, 0), line, font=font)[3] for line in wrapped_text.splitlines())
-
-        # Set background warning if the font size reaches 12
-        if font.size <= 12:
-            self.description_text.config(bg='#ffdddd')  # Light red background for warning
-            self.show_warning_tooltip("Warning: Too much text. Please shorten the description.")
-        else:
-            self.description_text.config(bg='white')  # Reset background if size is acceptable
+        return None, creator.layout(*fields)['Description']['overflow']
 
-        # Draw the wrapped text
-        y_offset = box_y0
-        for line in wrapped_text.splitlines():
-            draw.text((box_x0, y_offset), line, font=font, fill="black")
-            y_offset += draw.textbbox((0, 0), line, font=font)[3] + 4  # Add spacing between lines
-
-    def adjust_font_size(self, draw, text, font, box, max_font_size):
-        # Adjust font size until the entire text fits within the box
-        max_width = box[2] - box[0]
-        max_height = box[3] - box[1]
-
-        adjusted_font = ImageFont.truetype(font.path, max_font_size) if font else ImageFont.load_default()
-
-        while adjusted_font.size > 12:
-            wrapped_text = self.wrap_text(draw, text, adjusted_font, max_width, respect_formatting=True)
-            total_height = sum(draw.textbbox((0, 0), line, font=adjusted_font)[3] for line in wrapped_text.splitlines())
-
-            if total_height <= max_height:
-                break
-            adjusted_font = ImageFont.truetype(font.path, adjusted_font.size - 1)
-
-        return adjusted_font
-
-    def wrap_text(self, draw, text, font, max_width, respect_formatting=False):
-        if respect_formatting:
-            lines = text.splitlines()
-            wrapped_lines = []
-            for line in lines:
-                words = line.split()
-                current_line = ""
-                for word in words:
-                    test_line = f"{current_line} {word}".strip()
-                    if draw.textbbox((0, 0), test_line, font=font)[2] <= max_width:
-                        current_line = test_line
-                    else:
-                        wrapped_lines.append(current_line)
-                        current_line = word
-                wrapped_lines.append(current_line)
-            return "\n".join(wrapped_lines)
-        else:
-            words = text.split()
-            lines, current_line = [], ""
-            for word in words:
-                test_line = f"{current_line} {word}".strip()
-                if draw.textbbox((0, 0), test_line, font=font)[2] <= max_width:
-                    current_line = test_line
-                else:
-                    lines.append(current_line)
-                    current_line = word
-            lines.append(current_line)
-            return "\n".join(lines)
-
-    def check_description_length(self, event):
-        content = self.description_text.get("1.0", "end-1c")
-        draw = ImageDraw.Draw(Image.new("RGBA", (750, 1050)))
-        font = self.load_font(self.paths['font_b'], 40)
-        adjusted_font = self.adjust_font_size(draw, content, font, (49, 644, 701, 968), 40)
-        if adjusted_font.size <= 12:
-            self.description_text.config(bg='#ffdddd')
-        else:
-            self.description_text.config(bg='white')
+    def poll_live_preview(self):
+        try:
+            while True:
+                result = self.preview_worker.results.get_nowait()
+                if isinstance(result, Exception):
+                    print(f"Live preview failed: {result}")
+                    continue
+                card, overflow = result
+                if card:
+                    card_image = ImageTk.PhotoImage(card)
+                    self.preview_panel.config(image=card_image)
+                    self.preview_panel.image = card_image
+                self.description_text.config(bg='#ffdddd' if overflow else 'white')
+        except queue.Empty:
+            pass
+        self.root.after(50, self.poll_live_preview)
 
     def show_warning_tooltip(self, message):
         if hasattr(self, 'warning_label') and self.warning_label:
@@ -1,13 +1,384 @@
+import io
 import os
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from tkinter.ttk import Combobox, Label
-from PIL import Image, ImageDraw, ImageFont, ImageTk
-import webbrowser
-import traceback
+import json
+import math
+import time
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 reads JSON layouts only
+    tomllib = None
+
+class FontCache:
+    # Process-wide registry of loaded fonts keyed by (path, size, variation).
+    # Parsing a font file is far more expensive than looking one up, so every
+    # Creator shares this cache instead of calling ImageFont.truetype per size step.
+    def __init__(self, max_fonts=256):
+        self.max_fonts = max_fonts
+        self.hits = 0
+        self.misses = 0
+        self._fonts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, font_path, size, variation=None):
+        key = (font_path, size, variation)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+
+        # Load outside the lock so a cold font does not stall other threads
+        font = ImageFont.truetype(font_path, size)
+        if isinstance(variation, str):
+            font.set_variation_by_name(variation)
+        elif variation:
+            font.set_variation_by_axes(list(variation))
+
+        with self._lock:
+            # Another thread may have loaded the same font meanwhile; keep the first one
+            font = self._fonts.setdefault(key, font)
+            self._fonts.move_to_end(key)
+            while len(self._fonts) > self.max_fonts:
+                self._fonts.popitem(last=False)
+        return font
+
+    def preload(self, font_paths, sizes=range(12, 41), variation=None):
+        for font_path in font_paths:
+            for size in sizes:
+                self.get(font_path, size, variation)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'fonts': len(self._fonts),
+                'max_fonts': self.max_fonts,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+font_cache = FontCache()
+
+# Word metrics and measured line boxes per font object; tables go away when the font
+# cache evicts their font
+_advance_tables = weakref.WeakKeyDictionary()
+_bbox_tables = weakref.WeakKeyDictionary()
+_advance_tables_lock = threading.Lock()
+
+
+class TextMeasurer:
+    # Lays out words by summing cached per-word advances instead of measuring
+    # every growing line. calls counts the FreeType measurements actually made.
+    def __init__(self, font, max_words=4096, max_lines=1024):
+        self.font = font
+        self.max_words = max_words
+        self.max_lines = max_lines
+        self.calls = 0
+        with _advance_tables_lock:
+            self.words = _advance_tables.setdefault(font, {})
+            self.bboxes = _bbox_tables.setdefault(font, {})
+        # Joins whose estimate lands this close to the limit are confirmed with a real
+        # measurement, in case kerning across the space shifts the line width
+        self.tolerance = max(1, font.size // 8)
+        self.space = self.word(" ")[0]
+
+    def word(self, word):
+        # (advance, ink right edge, ink bottom) of a single word
+        metrics = self.words.get(word)
+        if metrics is None:
+            self.calls += 1
+            metrics = (self.font.getlength(word), *self.font.getbbox(word)[2:])
+            if len(self.words) >= self.max_words:
+                self.words.pop(next(iter(self.words)), None)
+            self.words[word] = metrics
+        return metrics
+
+    def bbox(self, text):
+        # Whole lines are remembered too: refitting text that changed in one place
+        # measures only the lines that changed
+        bbox = self.bboxes.get(text)
+        if bbox is None:
+            self.calls += 1
+            bbox = self.font.getbbox(text)
+            if len(self.bboxes) >= self.max_lines:
+                self.bboxes.pop(next(iter(self.bboxes)), None)
+            self.bboxes[text] = bbox
+        return bbox
+
+    def width(self, text):
+        return self.bbox(text)[2]
+
+    def wrap(self, words, max_width):
+        # Greedy line breaking with the same breaks as measuring each test line,
+        # returned as (line, line_height) pairs
+        lines = []
+        line, advance, bottom = [], 0, 0
+        for word in words:
+            word_advance, word_right, word_bottom = self.word(word)
+            estimate = advance + self.space + word_right if line else word_right
+            if abs(estimate - max_width) <= self.tolerance:
+                fits = self.width(" ".join(line + [word])) <= max_width
+            else:
+                fits = estimate <= max_width
+            if fits:
+                advance = advance + self.space + word_advance if line else word_advance
+                bottom = max(bottom, word_bottom)
+                line.append(word)
+            else:
+                lines.append((" ".join(line), bottom))
+                line, advance, bottom = [word], word_advance, word_bottom
+        lines.append((" ".join(line), bottom))
+        return lines
+
+
+class ImageCache:
+    # LRU of decoded images bounded by their pixel memory. Cached images are
+    # shared between renders, so callers must copy() before drawing on them.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        image = load()
+        image.load()
+
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = image
+                self.bytes += self.image_bytes(image)
+            image = self._images[key]
+            self._images.move_to_end(key)
+            self._evict()
+        return image
+
+    def _evict(self):
+        # Always keep the newest image, even if it alone exceeds the budget
+        while self.bytes > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.bytes -= self.image_bytes(evicted)
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def image_bytes(self, image):
+        return image.width * image.height * len(image.getbands())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': len(self._images),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+# Decoded RGBA template and art layers, keyed by (path, mtime)
+layer_cache = ImageCache(max_bytes=64 * 1024 * 1024)
+# Art with the template composited over it, keyed by both layers
+base_card_cache = ImageCache(max_bytes=32 * 1024 * 1024)
+
+
+def cache_budgets(canvas, max_scale=1):
+    # (layer, base card) budgets for renders up to max_scale: the scaled template and art
+    # next to their pyramids, and a base card at the largest scale beside smaller ones.
+    # The defaults above already cover 1x.
+    card_bytes = 4 * round(canvas[0] * max_scale) * round(canvas[1] * max_scale)
+    return max(64 * 1024 * 1024, 3 * card_bytes), max(32 * 1024 * 1024, 2 * card_bytes)
+
+
+def set_cache_budgets(layer_bytes, base_card_bytes):
+    layer_cache.resize(layer_bytes)
+    base_card_cache.resize(base_card_bytes)
+
+
+class TextLayer(namedtuple('TextLayer', 'offset mask diagnostics')):
+    # One field's text rasterized on its own: an L coverage mask cropped to the inked
+    # pixels, where its top left corner goes on the card and the diagnostics of the fit
+    # that produced it. mask is None when the text left no ink.
+    __slots__ = ()
+
+    def load(self):
+        if self.mask is not None:
+            self.mask.load()
+
+
+class TextLayerCache(ImageCache):
+    # Text layers keyed by everything that decides their pixels, so editing one field
+    # only refits and redraws that field
+    def image_bytes(self, layer):
+        return super().image_bytes(layer.mask) if layer.mask is not None else 0
+
+
+text_layer_cache = TextLayerCache(max_bytes=16 * 1024 * 1024)
+
+# Smallest size the auto-fit will shrink text to before flagging an overflow
+MIN_FONT_SIZE = 12
+
+# Compiled template layouts. Both are immutable; art_size is the art window art is
+# cropped and scaled to cover (None pastes art as it is), a field's font is a Creator font role
+# ('font_a' or 'font_b') or a font file path, and fit is 'width', 'height' or None.
+Layout = namedtuple('Layout', 'path canvas art_position art_size fields')
+FieldLayout = namedtuple('FieldLayout', 'name source font box min_size max_size fit wrap align color line_spacing')
+
+# Inputs of Creator.render, in argument order, as named by a field's source
+CARD_FIELDS = ('name', 'type', 'details', 'rarity', 'description')
+
+# Stock assets shared by the server and the batch CLI, relative to the working directory
+FONT_A = "assets/FontA_Cinzel-Bold.otf"
+FONT_B = "assets/FontB_CrimsonPro-VariableFont_wght.ttf"
+TEMPLATE = "assets/Leyfarer_card_item_Template_v1.png"
+DEFAULT_ART = "assets/Leyfarer_card_item_Placeholder_Art_v1.png"
+
+# Used for templates without a layout file of their own
+DEFAULT_LAYOUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "Leyfarer_card_item_Template_v1.json")
+LAYOUT_EXTENSIONS = ('.json', '.toml')
+
+_layouts = {}
+_layouts_lock = threading.Lock()
+
+
+def compile_layout(data, path=None):
+    # Validates a parsed layout file and turns it into a Layout
+    base = os.path.dirname(path) if path else ""
+    try:
+        canvas = tuple(int(value) for value in data['canvas'])
+        art_position = tuple(int(value) for value in data.get('art', {}).get('position', (0, 0)))
+        art_size = data.get('art', {}).get('size')
+        art_size = tuple(int(value) for value in art_size) if art_size else None
+        fields = []
+        for field in data['fields']:
+            font = field['font']
+            if font not in ('font_a', 'font_b'):
+                font = os.path.join(base, font)
+            fit = field.get('fit')
+            if fit not in (None, 'width', 'height'):
+                raise ValueError(f"field {field['name']!r} has unknown fit {fit!r}")
+            align = field.get('align', 'center')
+            if align not in ('left', 'center', 'right'):
+                raise ValueError(f"field {field['name']!r} has unknown align {align!r}")
+            fields.append(FieldLayout(
+                name=field['name'],
+                source=field.get('source', field['name'].lower()),
+                font=font,
+                box=tuple(int(value) for value in field['box']),
+                min_size=int(field.get('min_size', MIN_FONT_SIZE)),
+                max_size=int(field['max_size']),
+                fit=fit,
+                wrap=bool(field.get('wrap', fit == 'height')),
+                align=align,
+                color=field.get('color', "black"),
+                line_spacing=int(field.get('line_spacing', 4))
+            ))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid layout {path or ''}: {e!r}") from e
+    if len(canvas) != 2 or any(len(field.box) != 4 for field in fields):
+        raise ValueError(f"Invalid layout {path or ''}: canvas needs 2 values and boxes need 4")
+    return Layout(path, canvas, art_position, art_size, tuple(fields))
+
+
+def read_layout(path):
+    if path.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError(f"Reading {path} needs Python 3.11 or newer")
+        with open(path, 'rb') as layout_file:
+            return compile_layout(tomllib.load(layout_file), path)
+    with open(path, encoding='utf-8') as layout_file:
+        return compile_layout(json.load(layout_file), path)
+
+
+def layout_path(template_path):
+    # A template's layout sits next to it with the same name, e.g. card.png -> card.json
+    if template_path:
+        stem = os.path.splitext(template_path)[0]
+        for extension in LAYOUT_EXTENSIONS:
+            if os.path.exists(stem + extension):
+                return stem + extension
+    return DEFAULT_LAYOUT
+
+
+def load_layout(path):
+    # Compiled once per file version and shared by every render using it
+    key = (path, os.stat(path).st_mtime_ns)
+    layout = _layouts.get(key)
+    if layout is None:
+        layout = read_layout(path)
+        with _layouts_lock:
+            for stale in [stale for stale in _layouts if stale[0] == path]:
+                del _layouts[stale]
+            _layouts[key] = layout
+    return layout
+
+
+# Render scales the server and batch tools accept: 0.5x and 1x for the web, 2x and 4x for print
+OUTPUT_SCALES = (0.5, 1, 2, 4)
+
+# Output encodings for rendered cards. 'save' holds the Pillow save() options;
+# 'colors' quantizes to a palette first and 'background' flattens away the alpha.
+ENCODE_PROFILES = {
+    # Pillow defaults, byte-identical to what the server has always sent
+    'png': {'format': 'PNG', 'media_type': 'image/png', 'save': {}},
+    'png-fast': {'format': 'PNG', 'media_type': 'image/png', 'save': {'compress_level': 1}},
+    'png-small': {'format': 'PNG', 'media_type': 'image/png', 'save': {'compress_level': 9, 'optimize': True}},
+    'png-palette': {'format': 'PNG', 'media_type': 'image/png', 'save': {}, 'colors': 256},
+    'webp': {'format': 'WEBP', 'media_type': 'image/webp', 'save': {'lossless': True, 'quality': 0, 'method': 0}},
+    'webp-preview': {'format': 'WEBP', 'media_type': 'image/webp', 'save': {'quality': 80, 'method': 4}},
+    'jpeg-preview': {'format': 'JPEG', 'media_type': 'image/jpeg', 'save': {'quality': 85}, 'background': 'white'},
+}
+
+
+def encode_card(card, profile='png', **save_options):
+    # Encodes a rendered card with a named profile; save_options override the profile's own
+    settings = ENCODE_PROFILES[profile]
+    if settings.get('colors'):
+        card = card.quantize(settings['colors'], method=Image.Quantize.FASTOCTREE)
+    if settings.get('background'):
+        flattened = Image.new("RGB", card.size, settings['background'])
+        flattened.paste(card, (0, 0), card)
+        card = flattened
+    output = io.BytesIO()
+    card.save(output, format=settings['format'], **{**settings['save'], **save_options})
+    return output.getvalue()
+
 
 class Creator:
-    def __init__(self, fontA, fontB, background, art):
+    def __init__(self, fontA, fontB, background, art, font_cache=font_cache, layer_cache=layer_cache, base_card_cache=base_card_cache, layout=None,
+                 text_layer_cache=text_layer_cache):
         # Paths for fonts and graphics
         self.paths = {
             'font_a': fontA,
@@ -15,150 +386,367 @@ class Creator:
             'background_image': background,
             'card_art': art
         }
+        self.font_cache = font_cache
+        self.layer_cache = layer_cache
+        self.base_card_cache = base_card_cache
+        self.text_layer_cache = text_layer_cache
+        # Layout file to use instead of the one found next to the template
+        self.layout_file = layout
+        self._layout_paths = {}
+        # Text measurements made while fitting, across every card this Creator laid out
+        self.measure_count = 0
+        # Per-field diagnostics of the last card, see layout_field
+        self.diagnostics = {}
+        # Seconds spent in each stage of the last card: assets, composite, fit and draw
+        self.timings = {}
 
-    def generate_card(self, name, type, details, rarity, description):
-        try:
-            background_image = Image.open(self.paths['background_image'])
-            card_art_image = Image.open(self.paths['card_art']) if self.paths['card_art'] else None
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load images: {str(e)}")
-            return None
+    def generate_card(self, name, type, details, rarity, description, scale=1):
+        return self.render(name, type, details, rarity, description, scale)[0]
 
-        card = Image.new("RGBA", (750, 1050))
-        if card_art_image:
-            card.paste(card_art_image, (0, 0))
-        card.paste(background_image, (0, 0), background_image)
-        draw = ImageDraw.Draw(card)
+    def render(self, name, type, details, rarity, description, scale=1):
+        return self.render_fields(dict(zip(CARD_FIELDS, (name, type, details, rarity, description))), scale)
+
+    def layout(self, name, type, details, rarity, description):
+        return self.layout_fields(dict(zip(CARD_FIELDS, (name, type, details, rarity, description))))
 
-        # Load fonts
-        font_a = self.load_font(self.paths['font_a'], 40)
-        font_b = self.load_font(self.paths['font_b'], 40)
+    def layout_fields(self, values):
+        # Dry run of render_fields: fits every field and returns the same per-field
+        # diagnostics, without loading the template or art or drawing anything
+        layout = self.load_layout()
+        diagnostics = {}
+        for field in layout.fields:
+            diagnostics[field.name] = self.layout_field(field, values.get(field.source) or "")[2]
+        self.timings = {'fit': sum(field['fit_time'] for field in diagnostics.values())}
+        self.diagnostics = diagnostics
+        return diagnostics
+
+    def render_fields(self, values, scale=1):
+        # Renders the template's fields from a {source: text} dict. Returns the card and
+        # per-field diagnostics instead of reporting problems itself, and raises if the
+        # template or art cannot be loaded.
+        # scale renders the card that many times the canvas size: 0.4 for the GUI preview,
+        # 2 or 4 for print. Text is still fitted and wrapped in card coordinates, so font
+        # sizes and line breaks are the same at every scale; positions and font sizes are
+        # multiplied when drawing.
+        start = time.perf_counter()
+        self.timings = {'assets': 0.0}
+        layout = self.load_layout()
+        card = self.load_base_card(scale).copy()
+        draw = ImageDraw.Draw(card)
+        self.timings['composite'] = time.perf_counter() - start - self.timings['assets']
 
         # Draw text fields
-        text_entries = [
-            ("Name", name, font_a, (43, 52, 707, 108), 40, None, True, True),  # Moved Name 3 pixels lower from previous position
-            ("Type", type, font_a, (51, 561, 188, 617), 22, 22, False, False),  # Moved Type up by 3 pixels, fixed size 22
-            ("Details", details, font_a, (235, 561, 515, 617), 25, None, True, False),  # Moved Details up by 3 pixels, max size 25
-            ("Rarity", rarity, font_a, (561, 561, 698, 617), 22, 22, False, False),  # Moved Rarity up by 3 pixels, fixed size 22
-            ("Description", description, font_b, (49, 644, 701, 968), 40, None, True, True)
-        ]
-        for field_name, text, font, box, max_font_size, fixed_font_size, adjust_font, left_justified in text_entries:
-            self.draw_text(draw, field_name, text, font, box, max_font_size=max_font_size, fixed_font_size=fixed_font_size, adjust_font_size=adjust_font, left_justified=left_justified)
-
-        return card
+        diagnostics = {}
+        for field in layout.fields:
+            diagnostics[field.name] = self.draw_field(draw, field, values.get(field.source) or "", scale=scale)
+        self.timings['fit'] = sum(field['fit_time'] for field in diagnostics.values())
+        self.timings['draw'] = sum(field['draw_time'] for field in diagnostics.values())
+        self.diagnostics = diagnostics
+        return card, diagnostics
+
+    def load_layout(self):
+        template = self.paths['background_image']
+        if self.layout_file:
+            return load_layout(self.layout_file)
+        if template not in self._layout_paths:
+            self._layout_paths[template] = layout_path(template)
+        return load_layout(self._layout_paths[template])
+
+    def layer_key(self, image_path):
+        # A changed mtime means a new version of the file and a fresh cache entry
+        return (image_path, os.stat(image_path).st_mtime_ns) if image_path else None
+
+    def load_layer(self, key, scale=1, size=None):
+        # The layer at scale, cropped and scaled to cover size (a window in card units, as
+        # art is fitted to the art window) or at its own size when size is None. Every
+        # variant is resampled once from the nearest pyramid level and cached decoded, so
+        # renders after the first never decode or resize a layer.
+        target = self.scaled_size(size or self.load_level(key, 0).size, scale)
+        source = self.pyramid_source(key, target)
+        if source.size == target:
+            return source
+        return self.layer_cache.get((key, target), lambda: ImageOps.fit(source, target, Image.LANCZOS))
+
+    def load_level(self, key, level):
+        # Mip-style pyramid of a layer: level 0 is the decoded file and every level after
+        # it half the size of the one before, built on first use
+        if level == 0:
+            return self.layer_cache.get(key, lambda: Image.open(key[0]).convert("RGBA"))
+        return self.layer_cache.get((key, level), lambda: self.load_level(key, level - 1).reduce(2))
+
+    def pyramid_source(self, key, target):
+        # Smallest level that still covers target; larger outputs than the file scale up
+        # from the file itself
+        level = 0
+        image = self.load_level(key, 0)
+        while image.width // 2 >= target[0] and image.height // 2 >= target[1]:
+            level += 1
+            image = self.load_level(key, level)
+        return image
+
+    def scaled_size(self, size, scale):
+        return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+    def load_base_card(self, scale=1):
+        # Time spent checking and loading layers counts as the 'assets' stage
+        start = time.perf_counter()
+        layout = self.load_layout()
+        background_key = self.layer_key(self.paths['background_image'])
+        art_key = self.layer_key(self.paths['card_art'])
+        self.timings['assets'] = self.timings.get('assets', 0.0) + time.perf_counter() - start
+
+        def composite():
+            start = time.perf_counter()
+            background_image = self.load_layer(background_key, scale)
+            art = self.load_layer(art_key, scale, layout.art_size) if art_key else None
+            self.timings['assets'] += time.perf_counter() - start
+            card = Image.new("RGBA", self.scaled_size(layout.canvas, scale))
+            if art:
+                art_x, art_y = layout.art_position
+                card.paste(art, (round(art_x * scale), round(art_y * scale)))
+            card.paste(background_image, (0, 0), background_image)
+            return card
+
+        return self.base_card_cache.get((background_key, art_key, layout.canvas, layout.art_position, layout.art_size, scale), composite)
 
     def load_font(self, font_path, size):
+        if not font_path:
+            return ImageFont.load_default()
         try:
-            return ImageFont.truetype(font_path, size)
+            return self.font_cache.get(font_path, size)
         except Exception as e:
             print(f"Failed to load font: {e}")
             return ImageFont.load_default()
 
-    def draw_text(self, draw, field_name, text, font, box, max_font_size=None, fixed_font_size=None, adjust_font_size=False, left_justified=False):
+    def field_font(self, field):
+        return self.load_font(self.paths.get(field.font, field.font), field.max_size)
+
+    def draw_field(self, draw, field, text, scale=1):
+        # Draws one field from its cached text layer, fitting and rasterizing it first when
+        # this text has not been drawn in this field at this scale. Returns its diagnostics;
+        # on a cache hit fit_time and measure_calls are 0 and 'cached' is True.
         if not text:
-            return
+            font, lines, diagnostics = self.layout_field(field, text)
+            return dict(diagnostics, draw_time=0.0, cached=False)
 
-        max_font_size = max_font_size or font.size
-        adjusted_font = font
+        font_path = self.paths.get(field.font, field.font)
+        key = (field, font_path, text, scale, draw.im.size)
+        cached = True
 
-        # Use fixed font size if provided
-        if fixed_font_size:
-            adjusted_font = ImageFont.truetype(font.path, fixed_font_size)
+        def rasterize():
+            nonlocal cached
+            cached = False
+            return self.text_layer(field, text, scale, draw.im.size)
+
+        layer = self.text_layer_cache.get(key, rasterize)
+        start = time.perf_counter()
+        if layer.mask is not None:
+            draw.bitmap(layer.offset, layer.mask, fill=field.color)
+        paste_time = time.perf_counter() - start
+        if not cached:
+            return dict(layer.diagnostics, draw_time=layer.diagnostics['draw_time'] + paste_time, cached=False)
+        return dict(layer.diagnostics, fit_time=0.0, measure_calls=0, draw_time=paste_time, cached=True)
+
+    def text_layer(self, field, text, scale, size):
+        # Draws the text in full ink on an empty mask, at exactly the positions it would
+        # take on the card, then keeps only the inked part. The mask covers the rows the
+        # text can reach, plus a font size of slack; ink touching a cut edge means a glyph
+        # reached further, and the text is drawn again on a card-sized mask.
+        font, lines, diagnostics = self.layout_field(field, text)
+        start = time.perf_counter()
+        if field.wrap:
+            text_bottom = field.box[1] + sum(line_height + field.line_spacing for _, line_height in lines)
         else:
-            # Adjust font size to fit the box horizontally or vertically as needed
-            if field_name in ["Name", "Details"]:
-                max_width = box[2] - box[0]
-                while adjusted_font.size > 12 and draw.textbbox((0, 0), text, font=adjusted_font)[2] > max_width:
-                    adjusted_font = ImageFont.truetype(adjusted_font.path, adjusted_font.size - 1)
-            elif field_name == "Description":
-                max_height = box[3] - box[1]
-                wrapped_text = self.wrap_text(draw, text, adjusted_font, box[2] - box[0], respect_formatting=True)
-                total_height = sum(draw.textbbox((0, 0), line, font=adjusted_font)[3] for line in wrapped_text.splitlines())
-                while adjusted_font.size > 12 and total_height > max_height:
-                    adjusted_font = ImageFont.truetype(adjusted_font.path, adjusted_font.size - 1)
-                    wrapped_text = self.wrap_text(draw, text, adjusted_font, box[2] - box[0], respect_formatting=True)
-                    total_height = sum(draw.textbbox((0, 0), line, font=adjusted_font)[3] for line in wrapped_text.splitlines())
-
-        # Set adjusted font for text drawing
-        font = adjusted_font
-
-        if font.size <= 12:
-            self.show_warning(field_name)
-
-        if field_name == "Description":
-            self.draw_wrapped_text(draw, box, text, font, respect_formatting=True)
+            text_bottom = field.box[1] + lines[0][1]
+        top = min(size[1], max(0, math.floor((field.box[1] - font.size) * scale)))
+        bottom = max(top, min(size[1], math.ceil((max(field.box[3], text_bottom) + font.size) * scale)))
+        layer = self.rasterize_field(field, text, font, lines, scale, (size[0], bottom - top), top)
+        bbox = layer.getbbox()
+        if bbox and ((top > 0 and bbox[1] == 0) or (bottom < size[1] and bbox[3] == layer.height)):
+            top = 0
+            layer = self.rasterize_field(field, text, font, lines, scale, size, top)
+            bbox = layer.getbbox()
+        mask = layer.crop(bbox) if bbox else None
+        diagnostics['draw_time'] = time.perf_counter() - start
+        return TextLayer((bbox[0], bbox[1] + top) if bbox else (0, top), mask, diagnostics)
+
+    def rasterize_field(self, field, text, font, lines, scale, size, top):
+        # An L mask of the given size standing for the card rows from top down
+        layer = Image.new("L", size)
+        draw = ImageDraw.Draw(layer)
+        if field.wrap:
+            self.draw_wrapped_text(draw, field.box, text, font, respect_formatting=True, lines=lines, scale=scale,
+                                   align=field.align, fill=255, line_spacing=field.line_spacing, top=top)
         else:
-            self.draw_centered_text(draw, box, text, font)
+            self.draw_centered_text(draw, field.box, text, font, scale=scale, align=field.align, fill=255, top=top)
+        return layer
+
+    def layout_field(self, field, text):
+        # Chooses the font size and lines of a field without drawing anything. Returns the
+        # font, the (line, line_height) layout and plain-data diagnostics for the field.
+        start = time.perf_counter()
+        font = self.field_font(field)
+        if not text:
+            return font, [], {'font_size': None, 'lines': [], 'line_heights': [], 'overflow': False, 'measure_calls': 0,
+                              'fit_time': time.perf_counter() - start}
+
+        measure_count = self.measure_count
+        box_width = field.box[2] - field.box[0]
+        box_height = field.box[3] - field.box[1]
+
+        # The fallback font from load_font has no file to load other sizes from, so its
+        # fields keep their one size and only report whether they overflow
+        fit = field.fit if isinstance(getattr(font, 'path', None), str) else None
+        if fit == 'width':
+            # Shrink to fit the box horizontally
+            font = self.fit_line(text, font, field.box, field.min_size)
+        elif fit == 'height':
+            # Shrink to fit the box vertically; the chosen layout is reused for drawing
+            font, lines = self.fit_wrapped_text(text, font, field.box, respect_formatting=True, min_font_size=field.min_size)
+        elif field.wrap:
+            lines = self.layout_wrapped_text(text, font, box_width, respect_formatting=True)
+
+        if field.wrap:
+            overflow = sum(line_height for _, line_height in lines) > box_height
+        else:
+            width, line_height = self.text_bbox(text, font)[2:]
+            lines = [(text, line_height)]
+            overflow = width > box_width
+
+        return font, lines, {
+            'font_size': font.size,
+            'lines': [line for line, _ in lines],
+            'line_heights': [line_height for _, line_height in lines],
+            'overflow': overflow,
+            'measure_calls': self.measure_count - measure_count,
+            'fit_time': time.perf_counter() - start
+        }
+
+    def text_bbox(self, text, font):
+        measurer = TextMeasurer(font)
+        bbox = measurer.bbox(text)
+        self.measure_count += measurer.calls
+        return bbox
+
+    def scaled_font(self, font, scale):
+        # Pillow accepts fractional sizes, so scaled text keeps the card's proportions
+        if scale == 1 or not isinstance(getattr(font, 'path', None), str):
+            return font
+        return self.font_cache.get(font.path, font.size * scale)
 
-    def draw_centered_text(self, draw, box, text, font):
+    def draw_centered_text(self, draw, box, text, font, scale=1, align='center', fill="black", top=0):
+        # top is the card row of the draw target's first row, in scaled pixels. Shifting
+        # by whole pixels keeps the fractional start Pillow positions glyphs with.
         box_x0, box_y0, box_x1, box_y1 = box
         text_width, text_height = draw.textbbox((0, 0), text, font=font)[2:]
-        x = box_x0 + (box_x1 - box_x0 - text_width) / 2
+        x = self.aligned_x(box, text_width, align)
         y = box_y0 + (box_y1 - box_y0 - text_height) / 2
-        draw.text((x, y), text, font=font, fill="black")
+        draw.text((x * scale, y * scale - top), text, font=self.scaled_font(font, scale), fill=fill)
 
-    def draw_wrapped_text(self, draw, box, text, font, respect_formatting=False):
-        box_x0, box_y0, box_x1, box_y1 = box
-        max_width = box_x1 - box_x0
-        max_height = box_y1 - box_y0
+    def aligned_x(self, box, width, align):
+        if align == 'left':
+            return box[0]
+        if align == 'right':
+            return box[2] - width
+        return box[0] + (box[2] - box[0] - width) / 2
 
-        # Adjust font size until text fits within the bounding box
-        wrapped_text = self.wrap_text(draw, text, font, max_width, respect_formatting=respect_formatting)
-        total_height = sum(draw.textbbox((0, 0), line, font=font)[3] for line in wrapped_text.splitlines())
+    def draw_wrapped_text(self, draw, box, text, font, respect_formatting=False, lines=None, scale=1, align='left', fill="black", line_spacing=4, top=0):
+        box_y0 = box[1]
 
-        while font.size > 12 and total_height > max_height:
-            font = ImageFont.truetype(font.path, font.size - 1)
-            wrapped_text = self.wrap_text(draw, text, font, max_width, respect_formatting=respect_formatting)
-            total_height = sum(draw.textbbox((0, 0), line, font=font)[3] for line in wrapped_text.splitlines())
+        # Fit here only when the caller has not already chosen a layout
+        if lines is None:
+            font, lines = self.fit_wrapped_text(text, font, box, respect_formatting=respect_formatting)
 
-        # Draw the wrapped text
+        # Draw the wrapped text; positions advance in full-size coordinates
+        draw_font = self.scaled_font(font, scale)
         y_offset = box_y0
-        for line in wrapped_text.splitlines():
-            draw.text((box_x0, y_offset), line, font=font, fill="black")
-            y_offset += draw.textbbox((0, 0), line, font=font)[3] + 4  # Add spacing between lines
+        for line, line_height in lines:
+            x = box[0] if align == 'left' else self.aligned_x(box, self.text_bbox(line, font)[2], align)
+            draw.text((x * scale, y_offset * scale - top), line, font=draw_font, fill=fill)
+            y_offset += line_height + line_spacing  # Add spacing between lines
 
     def adjust_font_size(self, draw, text, font, box, max_font_size):
         # Adjust font size until the entire text fits within the box
+        if not font:
+            return ImageFont.load_default()
+        font = self.font_cache.get(font.path, max_font_size)
+        return self.fit_wrapped_text(text, font, box, respect_formatting=True)[0]
+
+    def fit_font_size(self, fits, max_size, min_size=MIN_FONT_SIZE, estimate=None):
+        # Largest size in [min_size, max_size] for which fits(size) holds, or min_size if
+        # none does. Text extent grows with font size, so a binary search gives the same
+        # answer as stepping down one point at a time. When max_size does not fit,
+        # estimate() may seed the search with a guess; its neighbours are probed next.
+        if max_size <= min_size or fits(max_size):
+            return max_size
+
+        best, low, high = min_size, min_size + 1, max_size - 1
+        hint = estimate() if estimate else None
+        while low <= high:
+            size = hint if hint is not None and low <= hint <= high else (low + high) // 2
+            if fits(size):
+                best, low = size, size + 1
+                next_hint = size + 1
+            else:
+                high = size - 1
+                next_hint = size - 1
+            hint = next_hint if size == hint else None
+        return best
+
+    def fit_line(self, text, font, box, min_font_size=MIN_FONT_SIZE):
+        max_width = box[2] - box[0]
+        widths = {}
+
+        def fits(size):
+            widths[size] = self.text_bbox(text, self.font_cache.get(font.path, size))[2]
+            return widths[size] <= max_width
+
+        def estimate():
+            # Width scales roughly linearly with font size
+            return font.size * max_width // widths[font.size]
+
+        size = self.fit_font_size(fits, font.size, min_font_size, estimate)
+        return self.font_cache.get(font.path, size)
+
+    def fit_wrapped_text(self, text, font, box, respect_formatting=False, min_font_size=MIN_FONT_SIZE):
+        # Returns the fitted font and its layout as a list of (line, line_height)
         max_width = box[2] - box[0]
         max_height = box[3] - box[1]
+        layouts = {}
+
+        def layout(size):
+            if size not in layouts:
+                layouts[size] = self.layout_wrapped_text(text, self.font_cache.get(font.path, size), max_width, respect_formatting=respect_formatting)
+            return layouts[size]
 
-        adjusted_font = ImageFont.truetype(font.path, max_font_size) if font else ImageFont.load_default()
+        def fits(size):
+            return sum(line_height for _, line_height in layout(size)) <= max_height
 
-        while adjusted_font.size > 12:
-            wrapped_text = self.wrap_text(draw, text, adjusted_font, max_width, respect_formatting=True)
-            total_height = sum(draw.textbbox((0, 0), line, font=adjusted_font)[3] for line in wrapped_text.splitlines())
+        def estimate():
+            # Wrapped text area scales roughly with the square of the font size
+            total_height = sum(line_height for _, line_height in layout(font.size))
+            return int(font.size * (max_height / total_height) ** 0.5)
 
-            if total_height <= max_height:
-                break
-            adjusted_font = ImageFont.truetype(font.path, adjusted_font.size - 1)
+        size = self.fit_font_size(fits, font.size, min_font_size, estimate)
+        return self.font_cache.get(font.path, size), layout(size)
 
-        return adjusted_font
+    def layout_wrapped_text(self, text, font, max_width, respect_formatting=False):
+        lines = self.wrap_lines(text, font, max_width, respect_formatting=respect_formatting)
+        # Match splitting the joined text: a trailing empty line does not take up height
+        if lines and not lines[-1][0]:
+            lines.pop()
+        return lines
 
     def wrap_text(self, draw, text, font, max_width, respect_formatting=False):
+        return "\n".join(line for line, _ in self.wrap_lines(text, font, max_width, respect_formatting=respect_formatting))
+
+    def wrap_lines(self, text, font, max_width, respect_formatting=False):
+        measurer = TextMeasurer(font)
         if respect_formatting:
-            lines = text.splitlines()
             wrapped_lines = []
-            for line in lines:
-                words = line.split()
-                current_line = ""
-                for word in words:
-                    test_line = f"{current_line} {word}".strip()
-                    if draw.textbbox((0, 0), test_line, font=font)[2] <= max_width:
-                        current_line = test_line
-                    else:
-                        wrapped_lines.append(current_line)
-                        current_line = word
-                wrapped_lines.append(current_line)
-            return "\n".join(wrapped_lines)
+            for line in text.splitlines():
+                wrapped_lines.extend(measurer.wrap(line.split(), max_width))
         else:
-            words = text.split()
-            lines, current_line = [], ""
-            for word in words:
-                test_line = f"{current_line} {word}".strip()
-                if draw.textbbox((0, 0), test_line, font=font)[2] <= max_width:
-                    current_line = test_line
-                else:
-                    lines.append(current_line)
-                    current_line = word
-            lines.append(current_line)
-            return "\n".join(lines)
\ No newline at end of file
+            wrapped_lines = measurer.wrap(text.split(), max_width)
+        self.measure_count += measurer.calls
+        return wrapped_lines
@@ -0,0 +1,249 @@
+import io
+import sys
+import time
+import zlib
+import argparse
+from collections import namedtuple
+from PIL import Image, ImageDraw
+from batch import read_records, render_stream, render_card, worker_settings, add_deck_arguments, deck_settings
+from cardcreatorLib import load_layout, layout_path
+
+# Sheet sizes in inches
+PAGE_SIZES = {
+    'letter': (8.5, 11.0),
+    'a4': (210 / 25.4, 297 / 25.4)
+}
+
+# A sheet layout in pixels: where the top-left card's trim corner sits, the cards per row
+# and column, the bleed added around each card and the gap between trimmed cards
+Sheet = namedtuple('Sheet', 'page_size card_size dpi columns rows origin bleed gap crop_marks')
+
+
+def sheet_layout(page='letter', card_size=(750, 1050), dpi=300, bleed=0.125, gap=0.0, margin=0.1, crop_marks=True):
+    # Fits as many cards as the page holds inside its margins and centres the grid. Sizes
+    # are in inches; at the default 300 dpi a 750x1050 card prints at poker size.
+    page_size = tuple(round(inches * dpi) for inches in PAGE_SIZES[page])
+    bleed, gap, margin = round(bleed * dpi), round(gap * dpi), round(margin * dpi)
+    usable = [side - 2 * margin - 2 * bleed + gap for side in page_size]
+    columns, rows = (usable[axis] // (card_size[axis] + gap) for axis in (0, 1))
+    if columns < 1 or rows < 1:
+        raise ValueError(f"A {card_size[0]}x{card_size[1]} card with {bleed}px bleed does not fit on {page} at {dpi} dpi")
+    grid = (columns * card_size[0] + (columns - 1) * gap, rows * card_size[1] + (rows - 1) * gap)
+    origin = tuple((page_size[axis] - grid[axis]) // 2 for axis in (0, 1))
+    return Sheet(page_size, tuple(card_size), dpi, columns, rows, origin, bleed, gap, crop_marks)
+
+
+def bleed_card(card, bleed):
+    # Flattens a card onto white and extends its outermost pixels by `bleed` on every side,
+    # so a slightly off cut never shows paper
+    flattened = Image.new("RGB", card.size, "white")
+    flattened.paste(card, (0, 0), card if card.mode == "RGBA" else None)
+    if not bleed:
+        return flattened
+    width, height = card.size
+    tile = Image.new("RGB", (width + 2 * bleed, height + 2 * bleed))
+    tile.paste(flattened.crop((0, 0, width, 1)).resize((width, bleed)), (bleed, 0))
+    tile.paste(flattened.crop((0, height - 1, width, height)).resize((width, bleed)), (bleed, height + bleed))
+    tile.paste(flattened.crop((0, 0, 1, height)).resize((bleed, height)), (0, bleed))
+    tile.paste(flattened.crop((width - 1, 0, width, height)).resize((bleed, height)), (width + bleed, bleed))
+    for x, y in ((0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)):
+        corner = (0 if x == 0 else width + bleed, 0 if y == 0 else height + bleed)
+        tile.paste(flattened.getpixel((x, y)), corner + (corner[0] + bleed, corner[1] + bleed))
+    tile.paste(flattened, (bleed, bleed))
+    return tile
+
+
+def render_sheet_card(index, record):
+    # Runs in the render workers: the card comes back flattened, with its bleed and as raw
+    # RGB, so the main process only pastes it onto the sheet
+    try:
+        tile = bleed_card(render_card(record), worker_settings['bleed'])
+        return index, record, (tile.size, tile.tobytes()), None
+    except Exception as e:
+        return index, record, None, f"{type(e).__name__}: {e}"
+
+
+def new_sheet(sheet):
+    page = Image.new("RGB", sheet.page_size, "white")
+    if sheet.crop_marks:
+        draw_crop_marks(page, sheet)
+    return page
+
+
+def draw_crop_marks(page, sheet):
+    # Short lines in the margin lining up with every trim edge, kept clear of the bleed
+    draw = ImageDraw.Draw(page)
+    width = max(1, sheet.dpi // 150)
+    offset = sheet.bleed + sheet.dpi // 32
+    length = sheet.dpi // 4
+    left, top = sheet.origin
+    right = left + sheet.columns * sheet.card_size[0] + (sheet.columns - 1) * sheet.gap
+    bottom = top + sheet.rows * sheet.card_size[1] + (sheet.rows - 1) * sheet.gap
+    trims_x = {left + column * (sheet.card_size[0] + sheet.gap) + edge for column in range(sheet.columns) for edge in (0, sheet.card_size[0])}
+    trims_y = {top + row * (sheet.card_size[1] + sheet.gap) + edge for row in range(sheet.rows) for edge in (0, sheet.card_size[1])}
+    for x in trims_x:
+        draw.line((x, max(0, top - offset - length), x, top - offset), fill="black", width=width)
+        draw.line((x, bottom + offset, x, min(sheet.page_size[1], bottom + offset + length)), fill="black", width=width)
+    for y in trims_y:
+        draw.line((max(0, left - offset - length), y, left - offset, y), fill="black", width=width)
+        draw.line((right + offset, y, min(sheet.page_size[0], right + offset + length), y), fill="black", width=width)
+
+
+def place_card(page, sheet, slot, tile):
+    # Bleed is kept in full on the grid's outer edges; between cards it is cut back to
+    # half the gap so a card's bleed never covers its neighbour
+    column, row = slot % sheet.columns, slot // sheet.columns
+    card_width, card_height = sheet.card_size
+    x = sheet.origin[0] + column * (card_width + sheet.gap)
+    y = sheet.origin[1] + row * (card_height + sheet.gap)
+    inner = min(sheet.bleed, sheet.gap // 2)
+    left = sheet.bleed if column == 0 else inner
+    right = sheet.bleed if column == sheet.columns - 1 else inner
+    top = sheet.bleed if row == 0 else inner
+    bottom = sheet.bleed if row == sheet.rows - 1 else inner
+    crop = (sheet.bleed - left, sheet.bleed - top, sheet.bleed + card_width + right, sheet.bleed + card_height + bottom)
+    page.paste(tile.crop(crop), (x - left, y - top))
+
+
+def impose(tiles, sheet):
+    # Places bled cards N-up and yields each sheet as soon as it is full, so only one
+    # sheet is ever held in memory
+    per_sheet = sheet.columns * sheet.rows
+    page = None
+    for position, tile in enumerate(tiles):
+        slot = position % per_sheet
+        if slot == 0:
+            page = new_sheet(sheet)
+        place_card(page, sheet, slot, tile)
+        if slot == per_sheet - 1:
+            yield page
+            page = None
+    if page is not None:
+        yield page
+
+
+def in_deck_order(results):
+    # render_stream yields cards as they finish; sheets are filled in deck order
+    waiting = {}
+    next_index = 0
+    for index, record, data, error in results:
+        waiting[index] = (record, data, error)
+        while next_index in waiting:
+            yield (next_index, *waiting.pop(next_index))
+            next_index += 1
+
+
+class PdfWriter:
+    # Minimal PDF writer that streams: every page image is written to the file as soon as
+    # it is added, and only object offsets are kept until close() writes the page tree.
+    # Pillow's own PDF writer needs every page up front.
+    def __init__(self, path, quality=92, compression='jpeg'):
+        self.file = open(path, 'wb')
+        self.quality = quality
+        self.compression = compression
+        self.offsets = {}
+        self.pages = []
+        # 1 is the catalog and 2 the page tree, both written last
+        self.next_id = 3
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write_object(self, object_id, dictionary, stream=None):
+        self.offsets[object_id] = self.file.tell()
+        self.file.write(f"{object_id} 0 obj\n{dictionary}\n".encode('ascii'))
+        if stream is not None:
+            self.file.write(b"stream\n" + stream + b"\nendstream\n")
+        self.file.write(b"endobj\n")
+
+    def add_page(self, image, dpi):
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        if self.compression == 'jpeg':
+            output = io.BytesIO()
+            image.save(output, "JPEG", quality=self.quality)
+            data, image_filter = output.getvalue(), "/DCTDecode"
+        else:
+            data, image_filter = zlib.compress(image.tobytes(), 6), "/FlateDecode"
+        width, height = image.size
+        self.write_object(image_id, f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+                                    f"/BitsPerComponent 8 /Filter {image_filter} /Length {len(data)} >>", data)
+
+        # Page sizes are in points, 72 to the inch
+        page_width, page_height = width * 72 / dpi, height * 72 / dpi
+        content = f"q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q".encode('ascii')
+        self.write_object(content_id, f"<< /Length {len(content)} >>", content)
+        self.write_object(page_id, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.2f} {page_height:.2f}] "
+                                   f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>")
+        self.pages.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page} 0 R" for page in self.pages)
+        self.write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>")
+        self.write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.file.tell()
+        entries = "".join(f"{self.offsets[object_id]:010d} 00000 n \n" for object_id in range(1, self.next_id))
+        self.file.write(f"xref\n0 {self.next_id}\n0000000000 65535 f \n{entries}".encode('ascii'))
+        self.file.write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('ascii'))
+        self.file.close()
+
+
+def write_deck_pdf(records, path, sheet, settings, workers=None, quality=92, compression='jpeg', progress=None):
+    # Renders, imposes and writes a deck; returns (cards, pages, failed)
+    counts = {'cards': 0, 'failed': 0}
+
+    def tiles():
+        for index, record, data, error in in_deck_order(render_stream(records, {**settings, 'bleed': sheet.bleed}, workers=workers,
+                                                                      render=render_sheet_card)):
+            if error:
+                counts['failed'] += 1
+                print(f"Card {index + 1} ({record.get('name')!r}) failed: {error}", file=sys.stderr)
+                continue
+            counts['cards'] += 1
+            size, pixels = data
+            yield Image.frombytes("RGB", size, pixels)
+
+    writer = PdfWriter(path, quality, compression)
+    pages = 0
+    try:
+        for page in impose(tiles(), sheet):
+            writer.add_page(page, sheet.dpi)
+            pages += 1
+            if progress:
+                progress(counts['cards'], pages)
+    finally:
+        writer.close()
+    return counts['cards'], pages, counts['failed']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a deck onto N-up print sheets in one PDF")
+    add_deck_arguments(parser)
+    parser.add_argument("--out", required=True, help="PDF file to write")
+    parser.add_argument("--page", default="letter", choices=list(PAGE_SIZES))
+    parser.add_argument("--dpi", type=int, help="print resolution; sets the printed card size (default 300 per unit of --scale)")
+    parser.add_argument("--bleed", type=float, default=0.125, help="inches of bleed around each card")
+    parser.add_argument("--gap", type=float, default=0.0, help="inches between trimmed cards")
+    parser.add_argument("--margin", type=float, default=0.1, help="inches of page left clear for the printer")
+    parser.add_argument("--no-crop-marks", dest="crop_marks", action="store_false")
+    parser.add_argument("--compression", default="jpeg", choices=["jpeg", "flate"], help="page image encoding (flate is lossless)")
+    parser.add_argument("--quality", type=int, default=92, help="JPEG quality of the page images")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Cards keep their printed size at every --scale unless --dpi says otherwise
+    canvas = load_layout(layout_path(args.template)).canvas
+    card_size = tuple(round(side * args.scale) for side in canvas)
+    sheet = sheet_layout(args.page, card_size, args.dpi or round(300 * args.scale), args.bleed, args.gap, args.margin, args.crop_marks)
+    print(f"{sheet.columns}x{sheet.rows} cards per {args.page} sheet", file=sys.stderr)
+    start = time.perf_counter()
+
+    def progress(cards, pages):
+        if pages % max(1, args.progress // (sheet.columns * sheet.rows)) == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{pages} pages, {cards} cards in {elapsed:.1f}s ({pages / elapsed:.2f} pages/s)", file=sys.stderr)
+
+    cards, pages, failed = write_deck_pdf(read_records(args.input, args.format), args.out, sheet, deck_settings(args),
+                                          workers=args.workers, quality=args.quality, compression=args.compression, progress=progress)
+    elapsed = time.perf_counter() - start
+    print(f"Imposed {cards} cards on {pages} pages, {failed} failed, in {elapsed:.1f}s ({pages / max(elapsed, 1e-9):.2f} pages/s)")
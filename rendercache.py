@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Bump when a change to the renderer alters its output so old cached cards are not served
+CACHE_VERSION = 1
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    # sha256 of a file, recomputed only when its mtime or size changes
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as asset:
+            for block in iter(lambda: asset.read(1024 * 1024), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        with _digests_lock:
+            # Forget digests of older versions of the same file
+            for stale in [stale for stale in _digests if stale[0] == path]:
+                del _digests[stale]
+            _digests[key] = digest
+    return digest
+
+
+def render_key(fields, asset_paths, profile, save_options, scale=1):
+    # Content address of a render: the card text, the digests of every file it is drawn
+    # from, the encoding and the output scale. Editing an asset changes its digest and so
+    # every key using it.
+    normalized = {
+        'version': CACHE_VERSION,
+        'fields': list(fields),
+        'assets': [file_digest(path) if path else None for path in asset_paths],
+        'profile': profile,
+        'save_options': save_options
+    }
+    if scale != 1:
+        # Only other scales add it, so keys and ETags of 1x cards stay as they were
+        normalized['scale'] = scale
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    # Encoded cards by content key in a memory LRU bounded by bytes, optionally backed by
+    # a directory that survives restarts and is pruned oldest-first when over its budget.
+    def __init__(self, max_bytes=256 * 1024 * 1024, directory=None, max_disk_bytes=2 * 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.disk_errors = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        self._remember(key, data)
+        self._write_disk(key, data)
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = data
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'rb') as cached:
+                return cached.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key, data):
+        # The disk tier is best effort: a full disk or a missing directory costs the
+        # cached copy, never the response
+        if not self.directory or os.path.exists(self._path(key)):
+            return
+        temporary = None
+        try:
+            # Write to a temporary name first so readers never see a partial file
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(descriptor, 'wb') as cached:
+                cached.write(data)
+            os.replace(temporary, self._path(key))
+            temporary = None
+            with self._disk_lock:
+                self._disk_bytes += len(data)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._prune_disk()
+        except OSError:
+            with self._lock:
+                self.disk_errors += 1
+            if temporary:
+                try:
+                    os.remove(temporary)
+                except OSError:
+                    pass
+
+    def _prune_disk(self):
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.startswith(".tmp-")),
+                         key=lambda entry: entry.stat().st_mtime)
+        self._disk_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._disk_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'disk_bytes': self._disk_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'disk_errors': self.disk_errors,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
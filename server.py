@@ -1,62 +1,719 @@
 import json
-import io
+import os
+import sys
+import time
+import random
+import logging
+import hashlib
 import base64
+import signal
+import argparse
+import threading
 from urllib.parse import urlparse, parse_qs
 from http.server import BaseHTTPRequestHandler, HTTPServer
-from cardcreatorLib import Creator
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from cardcreatorLib import Creator, CARD_FIELDS, FONT_A, FONT_B, TEMPLATE, DEFAULT_ART, font_cache, layer_cache, base_card_cache, text_layer_cache, encode_card, layout_path, load_layout, cache_budgets, set_cache_budgets, ENCODE_PROFILES, OUTPUT_SCALES
+from rendercache import RenderCache, render_key
+from artindex import ArtIndex
+from metrics import Registry, COUNT_BUCKETS
 
-class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
+
+logger = logging.getLogger("cardserver")
+
+# Paths with their own metric series; every other path is counted as 'other' so clients
+# cannot create new series by requesting new URLs
+METRIC_ROUTES = ('/', '/batch', '/fit', '/metrics', '/stats')
+
+
+def route_label(path):
+    return path if path in METRIC_ROUTES else 'other'
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line; fields passed with extra={'fields': {...}} are merged in
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def init_render_worker(art_paths=(), budgets=None):
+    # Runs once in every render process so requests never load fonts from disk, and
+    # decodes and fits the given art up front so it is ready before the first request.
+    # budgets are the (layer, base card) cache sizes for the largest scale served.
+    if budgets:
+        set_cache_budgets(*budgets)
+    font_cache.preload([FONT_A, FONT_B])
+    for art in art_paths:
+        # Warming is best effort: art that fails here fails its own requests with a 500
+        # instead of breaking the whole pool
+        try:
+            Creator(FONT_A, FONT_B, TEMPLATE, art).load_base_card()
+        except Exception as e:
+            print(f"Could not preload art {art}: {e}", file=sys.stderr)
+
+
+def render_card(name, type, details, rarity, description, art, profile='png', save_options={}, scale=1):
+    # Returns the encoded card and the seconds spent in each stage, which the server
+    # process turns into metrics
+    creator = Creator(FONT_A, FONT_B, TEMPLATE, art)
+    card, diagnostics = creator.render(name, type, details, rarity, description, scale)
+    #card.save("renders/test.png")
+    start = time.perf_counter()
+    image_data = encode_card(card, profile, **save_options)
+    timings = {
+        'stages': {**creator.timings, 'encode': time.perf_counter() - start},
+        'fields': {field: (result['fit_time'], result['draw_time'], result['measure_calls']) for field, result in diagnostics.items()}
+    }
+    return image_data, timings
+
+
+class CardRequest:
+    # Request parsing and response choices shared by the threaded handler below and the
+    # asyncio front end. Subclasses provide self.headers and self.server.
     def map_art(self, name):
-        # try:
-        #     # Attempt to retrieve the value
-        #     value = my_dict[name]
-        #     print(f"Value found: {value}")
-        # except KeyError:
-        #     # Handle the exception if the key is not found
-        #     print(f"KeyError: '{key_to_access}' not found in the dictionary.")
-        return "art/Leyfarer_card_item_Placeholder_Art_v1.png"
-    
-    def do_POST(self):
-        # Parse the URL and query parameters
-        parsed_url = urlparse(self.path)
-        query_params = parse_qs(parsed_url.query)
+        # In-memory lookup; raises FileNotFoundError for unknown art when there is no default
+        return self.server.art_index.resolve(name).path
+
+    def card_args(self, post_data):
+        # Raises KeyError for a missing field and TypeError for a body that is not an
+        # object or a field that is not a string, both answered with a 400
+        if not isinstance(post_data, dict):
+            raise TypeError("expected a JSON object")
+        values = [post_data[field] for field in CARD_FIELDS + ('art',)]
+        for field, value in zip(CARD_FIELDS + ('art',), values):
+            if not isinstance(value, str):
+                raise TypeError(f"'{field}' must be a string")
+        name, type, details, rarity, description, art = values
+        return name, type, details, rarity, description, self.map_art(art)
 
-        # Read the content length and body
-        content_length = int(self.headers['Content-Length'])
-        post_data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+    def fit_values(self, post_data):
+        # /fit takes the same card object as a render; art is not needed and missing
+        # fields count as empty
+        if not isinstance(post_data, dict):
+            raise TypeError("expected a JSON object")
+        values = {source: post_data.get(source, "") for source in CARD_FIELDS}
+        for source, value in values.items():
+            if not isinstance(value, str):
+                raise TypeError(f"'{source}' must be a string")
+        return values
 
-        print(post_data)
+    def etag(self, key, mode, query_params):
+        if mode == 'raw':
+            return f'"{key}"'
+        # The legacy envelope also echoes the query parameters
+        query = json.dumps(sorted(query_params.items()))
+        return f'"{hashlib.sha256((key + query).encode("utf-8")).hexdigest()}"'
 
-        name = post_data['name']
-        type = post_data['type']
-        details = post_data['details']
-        rarity = post_data['rarity']
-        description = post_data['description']
-        art = self.map_art(post_data['art'])
+    def if_none_match(self):
+        header = self.headers.get('If-None-Match', '')
+        return [tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()]
 
-        creator = Creator("assets/FontA_Cinzel-Bold.otf","assets/FontB_CrimsonPro-VariableFont_wght.ttf","assets/Leyfarer_card_item_Template_v1.png",art)
-        png = creator.generate_card(name, type, details, rarity, description) 
-        #png.save("renders/test.png")
-        output = io.BytesIO()
-        png.save(output, format='PNG')
-        png_data = output.getvalue()
+    def encode_profile(self, query_params):
+        # ?profile= picks the encoding per request, falling back to the server's --profile
+        profile = query_params.get('profile', [self.server.profile])[0]
+        if profile not in ENCODE_PROFILES:
+            raise ValueError(f"Unknown profile '{profile}', expected one of: {', '.join(ENCODE_PROFILES)}")
 
-        base64_png = base64.b64encode(png_data).decode('utf-8')
+        save_options = {}
+        compress_level = query_params.get('compress_level', [None])[0]
+        if compress_level is None:
+            compress_level = self.server.compress_level
+        if compress_level is not None and ENCODE_PROFILES[profile]['format'] == 'PNG':
+            if not str(compress_level).isdigit() or int(compress_level) > 9:
+                raise ValueError("compress_level must be between 0 and 9")
+            save_options['compress_level'] = int(compress_level)
+        return profile, save_options
+
+    def output_scale(self, query_params):
+        # ?scale= renders at one of OUTPUT_SCALES times the template's canvas size
+        scale = query_params.get('scale', ['1'])[0]
+        scales = [option for option in OUTPUT_SCALES if option <= self.server.max_scale]
+        try:
+            return scales[scales.index(float(scale))]
+        except ValueError:
+            raise ValueError(f"Unknown scale '{scale}', expected one of: {', '.join(map(str, scales))}")
+
+    def response_mode(self, query_params, media_type='image/png'):
+        # ?response=raw|json wins; otherwise raw bytes are sent only when the Accept header
+        # prefers the image type over JSON, so existing clients keep the legacy envelope
+        requested = query_params.get('response', [None])[0]
+        if requested in ('raw', 'json'):
+            return requested
+        accepted = self.accepted_types()
+        return 'raw' if accepted.get(media_type, 0) > accepted.get('application/json', 0) else 'json'
+
+    def accepted_types(self):
+        accepted = {}
+        for media_range in self.headers.get('Accept', '').split(','):
+            media_type, *params = [part.strip() for part in media_range.split(';')]
+            quality = 1.0
+            for param in params:
+                if param.startswith('q='):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            if media_type:
+                accepted[media_type.lower()] = quality
+        return accepted
+
+    def json_envelope(self, image_data, query_params):
+        base64_png = base64.b64encode(image_data).decode('utf-8')
 
         # Prepare response data with query parameters and body
         response_data = {
             "query_params": {key: value[0] for key, value in query_params.items()},
             "body": base64_png
         }
+        return json.dumps(response_data).encode('utf-8')
+
+
+class SimpleHTTPRequestHandler(CardRequest, BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests; every response sets Content-Length
+    protocol_version = "HTTP/1.1"
+    # A keep-alive connection holds its I/O thread between requests, so idle ones are
+    # closed after a few seconds; more concurrent keep-alive clients than --threads
+    # make the rest wait up to this long for a thread
+    timeout = 5
+    # Headers and body go out in separate writes; without TCP_NODELAY small responses
+    # such as /fit wait on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        start = time.perf_counter()
+        self.stage_timings = {}
+        self.status_code = None
+        self.sampled = random.random() < self.server.log_sample
+        # Clients opt in to a Server-Timing header per request when the server allows it
+        self.debug_timing = self.server.debug_timing and self.headers.get('X-Debug-Timing', '') not in ('', '0')
+
+        # Parse the URL and query parameters
+        parsed_url = urlparse(self.path)
+        query_params = parse_qs(parsed_url.query)
+
+        post_data = None
+        try:
+            # Read the content length and body
+            try:
+                content_length = int(self.headers['Content-Length'])
+            except (TypeError, ValueError):
+                self.send_error(411, "Content-Length required")
+                return
+            try:
+                post_data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            except ValueError as e:
+                self.send_error(400, f"Invalid JSON: {e}")
+                return
+            self.observe_stage('parse', time.perf_counter() - start)
+            if self.sampled:
+                logger.debug("request body", extra={'fields': {"path": parsed_url.path, "body": post_data}})
+
+            if parsed_url.path == '/batch':
+                self.do_batch(post_data, query_params)
+            elif parsed_url.path == '/fit':
+                self.do_fit(post_data)
+            else:
+                self.do_render(post_data, query_params)
+        finally:
+            seconds = time.perf_counter() - start
+            route = route_label(parsed_url.path)
+            self.server.request_seconds.observe(seconds, path=route)
+            self.server.requests_total.inc(path=route, status=str(self.status_code))
+            if self.sampled:
+                logger.info("request", extra={'fields': {
+                    "path": parsed_url.path,
+                    "status": self.status_code,
+                    "seconds": round(seconds, 6),
+                    "stages": {stage: round(value, 6) for stage, value in self.stage_timings.items()},
+                    "field_lengths": {key: len(value) for key, value in post_data.items() if isinstance(value, str)} if isinstance(post_data, dict) else None
+                }})
+
+    def do_render(self, post_data, query_params):
+        try:
+            profile, save_options = self.encode_profile(query_params)
+            scale = self.output_scale(query_params)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+
+        try:
+            args = (*self.card_args(post_data), profile, save_options, scale)
+        except (KeyError, TypeError) as e:
+            self.send_error(400, f"Invalid card: {e!r}")
+            return
+        except OSError as e:
+            self.send_error(404, f"Missing asset: {e}")
+            return
+        media_type = ENCODE_PROFILES[profile]['media_type']
+        mode = self.response_mode(query_params, media_type)
+
+        # Identical inputs give identical bytes, so the content key doubles as the ETag
+        key = self.server.render_key(*args)
+        etag = self.etag(key, mode, query_params)
+        if etag in self.if_none_match() or '*' in self.if_none_match():
+            self.send_not_modified(etag)
+            return
+
+        try:
+            future = self.server.submit_render(*args, key=key)
+            image_data = future.result()
+        except ServerBusy:
+            self.send_busy()
+            return
+        except Exception as e:
+            logger.warning("render failed", exc_info=True)
+            self.send_error(500, f"Render failed: {type(e).__name__}: {e}")
+            return
+        self.stage_timings.update(future.timings['stages'])
+        for field, (fit_time, draw_time, measure_calls) in future.timings.get('fields', {}).items():
+            self.stage_timings[f'fit.{field}'] = fit_time
+
+        start = time.perf_counter()
+        if mode == 'raw':
+            self.send_image(image_data, media_type, etag)
+        else:
+            self.send_json_envelope(image_data, query_params, etag)
+        self.observe_stage('write', time.perf_counter() - start)
+
+    def do_fit(self, post_data):
+        try:
+            values = self.fit_values(post_data)
+        except TypeError as e:
+            self.send_error(400, f"Invalid card: {e!r}")
+            return
+
+        start = time.perf_counter()
+        body = json.dumps(self.server.fit(values)).encode('utf-8')
+        self.observe_stage('fit', time.perf_counter() - start)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_timing()
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def observe_stage(self, stage, seconds):
+        self.stage_timings[stage] = seconds
+        self.server.stage_seconds.observe(seconds, stage=stage)
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def send_timing(self):
+        if getattr(self, 'debug_timing', False):
+            self.send_header('Server-Timing', ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stage_timings.items()))
+
+    def log_message(self, format, *args):
+        # The per-request access line is debug output; sampled request logs replace it
+        logger.debug(format % args, extra={'fields': {"client": self.address_string()}})
+
+    def log_error(self, format, *args):
+        logger.warning(format % args, extra={'fields': {"client": self.address_string()}})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            body = self.server.metrics.exposition().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/stats':
+            body = json.dumps(self.server.stats()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.end_headers()
+
+    def do_batch(self, post_data, query_params):
+        # Renders an array of card specs (or {"cards": [...]}) in parallel and streams one
+        # NDJSON line per card as it finishes, so the first card arrives before the last
+        # is rendered. A bad card gets an error line instead of failing the batch.
+        specs = post_data.get('cards') if isinstance(post_data, dict) else post_data
+        if not isinstance(specs, list):
+            self.send_error(400, "Expected a JSON array of cards or {\"cards\": [...]}")
+            return
+        if len(specs) > self.server.max_batch:
+            self.send_error(413, f"At most {self.server.max_batch} cards per batch")
+            return
+        try:
+            profile, save_options = self.encode_profile(query_params)
+            scale = self.output_scale(query_params)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        media_type = ENCODE_PROFILES[profile]['media_type']
+
+        pending = {}
+        queued = iter(enumerate(specs))
+        results = []
+
+        def submit_next(block):
+            for index, spec in queued:
+                try:
+                    args = self.card_args(spec)
+                except (KeyError, TypeError) as e:
+                    results.append({"index": index, "status": 400, "error": f"Invalid card: {e!r}"})
+                    continue
+                except OSError as e:
+                    results.append({"index": index, "status": 404, "error": f"Missing asset: {e}"})
+                    continue
+                pending[self.server.submit_render(*args, profile, save_options, scale, block=block)] = index
+                return True
+            return False
+
+        # Only the first render may be refused with a 503; after that the batch waits for capacity
+        try:
+            submit_next(block=False)
+        except ServerBusy:
+            self.send_busy()
+            return
+
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            while len(pending) < self.server.batch_window and submit_next(block=True):
+                pass
+
+            while pending or results:
+                for result in results:
+                    self.write_chunk(json.dumps(result).encode('utf-8') + b"\n")
+                results.clear()
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        image_data = future.result()
+                        results.append({"index": index, "status": 200, "media_type": media_type,
+                                        "body": base64.b64encode(image_data).decode('utf-8')})
+                    except Exception as e:
+                        results.append({"index": index, "status": 500, "error": f"{type(e).__name__}: {e}"})
+                    submit_next(block=True)
+            self.write_chunk(b"")
+        except OSError:
+            # The client went away: drop the renders that have not started and queue no more
+            for future in pending:
+                future.cancel()
+            self.close_connection = True
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+    def send_image(self, image_data, media_type, etag=None):
+        # The encoded bytes go straight to the socket, no base64 or JSON copies
+        self.send_response(200)
+        self.send_header('Content-Type', media_type)
+        self.send_timing()
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(image_data)))
+        self.end_headers()
+        self.wfile.write(image_data)
+
+    def send_json_envelope(self, image_data, query_params, etag=None):
+        # Legacy mode: base64 image inside JSON, still labelled image/png for existing clients
+        start = time.perf_counter()
+        body = self.json_envelope(image_data, query_params)
+        self.observe_stage('base64', time.perf_counter() - start)
 
         # Respond with the query parameters and body as JSON
         self.send_response(200)
         self.send_header('Content-Type', 'image/png')
+        self.send_timing()
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_busy(self):
+        body = b"Server busy, retry shortly\n"
+        self.send_response(503)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Retry-After', '1')
         self.end_headers()
-        self.wfile.write(json.dumps(response_data).encode('utf-8'))
+        self.wfile.write(body)
+
+
+class RenderService:
+    # The render side of the server, shared by both front ends: the render process pool
+    # behind a bounded number of render slots, the render cache, the art index and
+    # metrics. A full queue raises ServerBusy instead of letting latency grow.
+    def __init__(self, workers=0, max_pending=32, profile='png', compress_level=None, max_batch=1000,
+                 render_cache=None, art_index=None, log_sample=0.01, debug_timing=False, max_scale=max(OUTPUT_SCALES), budgets=None):
+        # Layer and base card caches are sized for max_scale unless budgets says otherwise,
+        # so a large render does not evict its own layers before the next one
+        self.max_scale = max_scale
+        self.budgets = budgets or cache_budgets(load_layout(layout_path(TEMPLATE)).canvas, max_scale)
+        set_cache_budgets(*self.budgets)
+        self.log_sample = log_sample
+        self.debug_timing = debug_timing
+        self.metrics = Registry()
+        self.request_seconds = self.metrics.histogram("card_request_seconds", "Time to handle a request, by path", ("path",))
+        self.requests_total = self.metrics.counter("card_requests_total", "Requests handled, by path and status", ("path", "status"))
+        self.stage_seconds = self.metrics.histogram("card_stage_seconds", "Time spent in each stage of a card request", ("stage",))
+        self.field_seconds = self.metrics.histogram("card_field_seconds", "Time to fit or draw one text field", ("field", "phase"))
+        self.field_measures = self.metrics.histogram("card_field_measure_calls", "Text measurements made while fitting one field",
+                                                     ("field",), buckets=COUNT_BUCKETS)
+        self.render_cache_lookups = self.metrics.counter("card_render_cache_lookups_total", "Render cache lookups, by result", ("result",))
+        self.render_cache = render_cache or RenderCache()
+        self.art_index = art_index or ArtIndex("art", DEFAULT_ART, poll_interval=0)
+        self.profile = profile
+        self.compress_level = compress_level
+        self.max_batch = max_batch
+        # Cards of one batch rendering at once; the rest wait so one batch cannot fill the queue
+        self.batch_window = max(workers, 1) * 2
+        self.render_pool = ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker,
+                                               initargs=(self.warm_art(), self.budgets)) if workers else None
+        if self.render_pool:
+            # The pool forks every worker on its first task; do that now, before any listening
+            # or client socket exists, so no worker holds a copy that keeps a connection open
+            self.render_pool.submit(int).result()
+        self.render_slots = threading.BoundedSemaphore(max_pending)
+
+    def warm_art(self):
+        # The default art and as much indexed art as fits in the layer cache's budget
+        art_paths = [self.art_index.default.path] if self.art_index.default else []
+        art_paths += self.art_index.paths()
+        canvas = load_layout(layout_path(TEMPLATE)).canvas
+        return art_paths[:max(1, base_card_cache.max_bytes // (4 * canvas[0] * canvas[1]))]
+
+    def render_key(self, name, type, details, rarity, description, art, profile='png', save_options={}, scale=1):
+        return render_key((name, type, details, rarity, description), (FONT_A, FONT_B, TEMPLATE, layout_path(TEMPLATE), art), profile, save_options, scale)
+
+    def submit_render(self, *args, block=False, key=None):
+        # Returns a Future for the encoded card; its timings attribute holds the seconds
+        # spent in each stage. Cached cards come back immediately; otherwise raises
+        # ServerBusy when no render slot is free. Cancelling the Future drops a render
+        # that has not started yet; one already running still finishes into the cache.
+        start = time.perf_counter()
+        key = key or self.render_key(*args)
+        cached = self.render_cache.get(key)
+        result = Future()
+        if cached is not None:
+            self.render_cache_lookups.inc(result='hit')
+            result.timings = {'stages': {'cache': time.perf_counter() - start}}
+            self.stage_seconds.observe(result.timings['stages']['cache'], stage='cache')
+            result.set_result(cached)
+            return result
+
+        self.render_cache_lookups.inc(result='miss')
+        if not self.render_slots.acquire(blocking=block):
+            raise ServerBusy()
+        if self.render_pool:
+            future = self.render_pool.submit(render_card, *args)
+        else:
+            future = Future()
+            try:
+                future.set_result(render_card(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        def finished(future):
+            self.render_slots.release()
+            if future.cancelled():
+                result.cancel()
+            elif future.exception() is not None:
+                if not result.cancelled():
+                    result.set_exception(future.exception())
+            else:
+                image_data, timings = future.result()
+                self.observe_render(timings)
+                # Answer first: caching may touch the disk and must not hold up or lose the response
+                if not result.cancelled():
+                    result.timings = timings
+                    result.set_result(image_data)
+                self.render_cache.put(key, image_data)
+
+        result.add_done_callback(lambda result: future.cancel() if result.cancelled() else None)
+        future.add_done_callback(finished)
+        return result
+
+    def observe_render(self, timings):
+        for stage, seconds in timings['stages'].items():
+            self.stage_seconds.observe(seconds, stage=stage)
+        for field, (fit_time, draw_time, measure_calls) in timings['fields'].items():
+            self.field_seconds.observe(fit_time, field=field, phase='fit')
+            self.field_seconds.observe(draw_time, field=field, phase='draw')
+            self.field_measures.observe(measure_calls, field=field)
+
+    def render(self, *args):
+        return self.submit_render(*args).result()
+
+    def fit(self, values):
+        # Fits the card's fields on the calling thread: no canvas, encode or render slot,
+        # so fit checks never queue behind renders
+        fields = Creator(FONT_A, FONT_B, TEMPLATE, None).layout_fields(values)
+        return {
+            "overflow": any(result['overflow'] for result in fields.values()),
+            "fields": {name: {key: result[key] for key in ('font_size', 'lines', 'line_heights', 'overflow')}
+                       for name, result in fields.items()}
+        }
+
+    def stats(self):
+        return {
+            "fonts": font_cache.stats(),
+            "layers": layer_cache.stats(),
+            "base_cards": base_card_cache.stats(),
+            "text_layers": text_layer_cache.stats(),
+            "renders": self.render_cache.stats(),
+            "art": self.art_index.stats()
+        }
+
+    def close_renders(self):
+        self.art_index.close()
+        if self.render_pool:
+            self.render_pool.shutdown(wait=True)
+
+
+class CardServer(RenderService, HTTPServer):
+    # Connections are handled on a fixed pool of I/O threads and card renders run on a
+    # process pool, so Pillow work spreads across cores. Both queues are bounded and
+    # reject with 503 when full instead of letting latency grow without limit.
+    def __init__(self, server_address, handler_class, threads=16, workers=0, max_connections=64, max_pending=32,
+                 profile='png', compress_level=None, max_batch=1000, render_cache=None, art_index=None,
+                 log_sample=0.01, debug_timing=False, max_scale=max(OUTPUT_SCALES), budgets=None):
+        # The render workers are forked before the listening socket is bound so they never
+        # hold the port; a failed bind still shuts them down through server_close
+        RenderService.__init__(self, workers, max_pending, profile, compress_level, max_batch,
+                               render_cache, art_index, log_sample, debug_timing, max_scale, budgets)
+        self.io_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+        self.connection_slots = threading.BoundedSemaphore(max_connections)
+        HTTPServer.__init__(self, server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        if not self.connection_slots.acquire(blocking=False):
+            self.reject_request(request)
+            return
+        self.io_pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.connection_slots.release()
+
+    def reject_request(self, request):
+        try:
+            request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        # Let in-flight requests finish before the render processes go away
+        HTTPServer.server_close(self)
+        self.io_pool.shutdown(wait=True)
+        self.close_renders()
+
+
+def add_service_arguments(parser):
+    # Options of the render side, shared with the asyncio front end
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="render processes (0 renders on the I/O threads)")
+    parser.add_argument("--max-pending", type=int, default=32, help="queued or running renders before requests get 503")
+    parser.add_argument("--profile", default="png", choices=list(ENCODE_PROFILES), help="default output encoding")
+    parser.add_argument("--max-batch", type=int, default=1000, help="most cards accepted by one /batch request")
+    parser.add_argument("--cache-bytes", type=int, default=256 * 1024 * 1024, help="memory for cached encoded cards")
+    parser.add_argument("--cache-dir", help="directory to keep cached cards in across restarts")
+    parser.add_argument("--cache-disk-bytes", type=int, default=2 * 1024 * 1024 * 1024, help="disk budget for --cache-dir")
+    parser.add_argument("--art-dir", default="art", help="directory of art, requested by path relative to it with or without extension")
+    parser.add_argument("--default-art", default=DEFAULT_ART, help="art used for names not in --art-dir ('' makes them a 404)")
+    parser.add_argument("--art-poll", type=float, default=2.0, help="seconds between rescans of --art-dir (0 disables)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG adds request bodies and access lines to the sampled logs")
+    parser.add_argument("--log-sample", type=float, default=0.01, help="fraction of requests logged")
+    parser.add_argument("--debug-timing", action="store_true", help="send a Server-Timing header to requests with X-Debug-Timing: 1")
+    parser.add_argument("--compress-level", type=int, choices=range(10), help="default zlib level for PNG profiles")
+    parser.add_argument("--max-scale", type=float, default=max(OUTPUT_SCALES), choices=OUTPUT_SCALES, help="largest ?scale= served")
+    parser.add_argument("--layer-cache-bytes", type=int, help="memory for decoded template and art layers (default sized for --max-scale)")
+    parser.add_argument("--base-card-cache-bytes", type=int, help="memory for composited base cards (default sized for --max-scale)")
+
+
+def start_service(args):
+    # Sets up logging, fonts and the art index, and returns the RenderService options
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(args.log_level)
+
+    # Parse every font size the renderer can pick up front so requests never hit the disk for fonts
+    font_cache.preload([FONT_A, FONT_B])
+    print(f"Preloaded fonts: {font_cache.stats()}")
+    art_index = ArtIndex(args.art_dir, args.default_art or None, poll_interval=args.art_poll).start()
+    print(f"Indexed art: {art_index.stats()}")
+    layer_bytes, base_card_bytes = cache_budgets(load_layout(layout_path(TEMPLATE)).canvas, args.max_scale)
+
+    return {
+        'workers': args.workers,
+        'max_pending': args.max_pending,
+        'profile': args.profile,
+        'compress_level': args.compress_level,
+        'max_batch': args.max_batch,
+        'render_cache': RenderCache(args.cache_bytes, args.cache_dir, args.cache_disk_bytes),
+        'art_index': art_index,
+        'log_sample': args.log_sample,
+        'debug_timing': args.debug_timing,
+        'max_scale': args.max_scale,
+        'budgets': (args.layer_cache_bytes or layer_bytes, args.base_card_cache_bytes or base_card_bytes)
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Card render server")
+    add_service_arguments(parser)
+    parser.add_argument("--threads", type=int, default=16,
+                        help="I/O threads handling connections; each keep-alive connection holds one until idle for 5s, "
+                             "so use at least the number of concurrent keep-alive clients")
+    parser.add_argument("--max-connections", type=int, default=64,
+                        help="open connections before new ones get 503; those beyond --threads wait for a thread")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    server_address = ('0.0.0.0', 8000)  # Bind to all addresses on port 8000
-    httpd = HTTPServer(server_address, SimpleHTTPRequestHandler)
-    print("Starting server on port 8000...")
+    args = parse_args()
+
+    server_address = (args.host, args.port)  # Bind to all addresses on port 8000 by default
+    httpd = CardServer(server_address, SimpleHTTPRequestHandler, threads=args.threads,
+                       max_connections=args.max_connections, **start_service(args))
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever to return, so it cannot run on the serving thread
+        threading.Thread(target=httpd.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Starting server on port {args.port} with {args.threads} I/O threads and {args.workers} render workers...")
     httpd.serve_forever()
+    httpd.server_close()
+    print("Server stopped")
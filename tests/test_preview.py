@@ -0,0 +1,34 @@
+import os
+import pytest
+from cardcreatorLib import Creator, text_layer_cache
+
+cardcreator = pytest.importorskip("cardcreator", reason="the GUI module needs tkinter")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = os.path.join(ROOT, "assets")
+CARDS = {
+    "short": ("Giant's Ring", "Item", "Requires Attunement", "Rare", "While wearing this ring you can cast enlarge/reduce."),
+    "long-name": ("Leyfarer's Everburning Sunforged Blade of the Hollow King and the Little Folk", "Weapon", "Charges: 3",
+                  "Legendary", "The blade sheds bright light.\nIt regains 1d3 charges daily at dawn."),
+    "overflow": ("Amulet", "Wondrous", "", "Common", "You gain advantage on Strength checks and saving throws. " * 60),
+}
+
+
+def render(card, scale):
+    # Text layers are cleared so both renders fit their fields instead of reusing a layer
+    text_layer_cache.clear()
+    creator = Creator(os.path.join(ASSETS, "FontA_Cinzel-Bold.otf"), os.path.join(ASSETS, "FontB_CrimsonPro-VariableFont_wght.ttf"),
+                      os.path.join(ASSETS, "Leyfarer_card_item_Template_v1.png"), os.path.join(ASSETS, "Leyfarer_card_item_Placeholder_Art_v1.png"))
+    return creator.render(*card, scale=scale)
+
+
+@pytest.mark.parametrize("name", CARDS)
+def test_preview_matches_full_render(name):
+    full_card, full = render(CARDS[name], 1)
+    preview_card, preview = render(CARDS[name], cardcreator.PREVIEW_SCALE)
+    assert preview_card.size == tuple(round(side * cardcreator.PREVIEW_SCALE) for side in full_card.size)
+    for field, diagnostics in full.items():
+        assert (preview[field]['font_size'], preview[field]['lines']) == (diagnostics['font_size'], diagnostics['lines']), field
+        assert preview[field]['overflow'] == diagnostics['overflow'], field
+    if name == "overflow":
+        assert full['Description']['overflow']
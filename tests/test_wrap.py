@@ -0,0 +1,60 @@
+import os
+import random
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from cardcreatorLib import Creator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONTS = [os.path.join(ROOT, "assets", name) for name in ("FontA_Cinzel-Bold.otf", "FontB_CrimsonPro-VariableFont_wght.ttf")]
+WORDS = ("the", "a", "of", "sword", "ring", "giant's", "folk", "attunement", "+1", "damage", "(1d8)", "slashing.", "When",
+         "you", "wield", "this,", "advantage", "on", "Strength", "checks", "and", "saving", "throws;", "AV", "Wa", "To",
+         "Leyfarer's", "—", "x", "WWWWWWWWWWWWWWWWWWWW")
+
+
+def reference_wrap(draw, text, font, max_width, respect_formatting=False):
+    # The original greedy wrapper: measures every test line with textbbox
+    if respect_formatting:
+        wrapped_lines = []
+        for line in text.splitlines():
+            current_line = ""
+            for word in line.split():
+                test_line = f"{current_line} {word}".strip()
+                if draw.textbbox((0, 0), test_line, font=font)[2] <= max_width:
+                    current_line = test_line
+                else:
+                    wrapped_lines.append(current_line)
+                    current_line = word
+            wrapped_lines.append(current_line)
+        return "\n".join(wrapped_lines)
+    lines, current_line = [], ""
+    for word in text.split():
+        test_line = f"{current_line} {word}".strip()
+        if draw.textbbox((0, 0), test_line, font=font)[2] <= max_width:
+            current_line = test_line
+        else:
+            lines.append(current_line)
+            current_line = word
+    lines.append(current_line)
+    return "\n".join(lines)
+
+
+def texts(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(0, 80))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randint(0, len(words)), rng.choice(("\n", "\n\n")))
+        yield " ".join(words), rng.randint(12, 40), rng.choice((120, 250, 652))
+
+
+@pytest.mark.parametrize("respect_formatting", [False, True])
+@pytest.mark.parametrize("font_path", FONTS, ids=["font_a", "font_b"])
+def test_wrap_matches_greedy_textbbox_wrapper(font_path, respect_formatting):
+    creator = Creator(FONTS[0], FONTS[1], None, None)
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    for text, size, max_width in texts(FONTS.index(font_path) * 2 + respect_formatting, 100):
+        font = ImageFont.truetype(font_path, size)
+        expected = reference_wrap(draw, text, font, max_width, respect_formatting)
+        assert creator.wrap_text(draw, text, font, max_width, respect_formatting) == expected, (text, size, max_width)
+        heights = [height for _, height in creator.layout_wrapped_text(text, font, max_width, respect_formatting)]
+        assert heights == [draw.textbbox((0, 0), line, font=font)[3] for line in expected.splitlines()], (text, size, max_width)